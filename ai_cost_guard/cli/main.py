@@ -4,10 +4,10 @@ CLI interface for AI Cost Guard.
 Provides command-line access to all tool functionality.
 """
 
+import json
 import os
 import sys
 from typing import Optional
-import sqlite3
 
 import typer
 from rich.console import Console
@@ -15,6 +15,7 @@ from rich.table import Table
 
 from ai_cost_guard.core.guardrails import GuardrailConfig
 from ai_cost_guard.core.simulation import (
+    SimulationResult,
     SimulationVerdict,
     simulate_cost_impact
 )
@@ -86,6 +87,11 @@ def simulate(
         "--enforced",
         "-e",
         help="Exit with error code if simulation fails"
+    ),
+    json_output: bool = typer.Option(
+        False,
+        "--json",
+        help="Print the result as JSON instead of a formatted report"
     )
 ):
     """
@@ -103,6 +109,17 @@ def simulate(
         # Initialize repository and config
         repository = get_repository()
         
+        # simulate_cost_impact reports an empty result for a missing schema,
+        # so only the formatted report needs the init hint up front
+        if not json_output and not repository.schema_initialized():
+            console.print("\n[bold yellow]No historical AI usage data found[/]")
+            console.print("\nTo get started with AI Cost Guard:")
+            console.print("1. Run `ai-cost-guard init` to initialize the database")
+            console.print("2. Enable the SDK in your application")
+            console.print("3. Make some API calls through the SDK")
+            console.print("4. Run this command again to see the simulation results\n")
+            sys.exit(EXIT_CODE_PASS)
+        
         # Create guardrail config from CLI args
         config = GuardrailConfig(
             max_cost_per_request=max_cost,
@@ -116,17 +133,19 @@ def simulate(
             repository=repository
         )
         
+        if json_output:
+            _print_json(result)
         # If no data was found, show a helpful message
-        if not result.per_feature_results and result.estimated_monthly_impact == 0:
+        elif not result.per_feature_results and result.estimated_monthly_impact == 0:
             console.print("\n[bold yellow]No historical AI usage data found[/]")
             console.print("\nTo get started with AI Cost Guard:")
             console.print("1. Enable the SDK in your application")
             console.print("2. Make some API calls through the SDK")
             console.print("3. Run this command again to see the simulation results\n")
             sys.exit(EXIT_CODE_PASS)
-        
-        # Display results
-        _display_simulation_result(result)
+        else:
+            # Display results
+            _display_simulation_result(result)
         
         # Handle exit code - WARN is non-failing (0) as per requirements
         if enforced and result.overall_verdict == SimulationVerdict.FAIL:
@@ -134,31 +153,33 @@ def simulate(
         else:
             sys.exit(EXIT_CODE_PASS)  # Both PASS and WARN exit with 0
             
-    except sqlite3.OperationalError as e:
-        if "no such table" in str(e).lower():
-            console.print("\n[bold yellow]No historical AI usage data found[/]")
-            console.print("\nTo get started with AI Cost Guard:")
-            console.print("1. Run `ai-cost-guard init` to initialize the database")
-            console.print("2. Enable the SDK in your application")
-            console.print("3. Make some API calls through the SDK")
-            console.print("4. Run this command again to see the simulation results\n")
-            sys.exit(EXIT_CODE_PASS)
-        raise
     except Exception as e:
-        console.print(f"[red]Error:[/] {str(e)}")
+        # Keep stdout parseable for --json consumers even on failure
+        if json_output:
+            typer.echo(json.dumps({"error": str(e)}))
+        else:
+            console.print(f"[red]Error:[/] {str(e)}")
         sys.exit(EXIT_CODE_FAIL)
 
 
+# Bound format methods avoid re-parsing the format string on every call
+_CURRENCY_FMT = "${:,.2f}".format
+_PCT_FMT = "{:+,.1f}%".format
+
 def _format_currency(amount: float) -> str:
     """Format currency with proper symbols and formatting."""
-    return f"${abs(amount):,.2f}"
+    return _CURRENCY_FMT(abs(amount))
 
 def _format_percent_change(before: float, after: float) -> str:
     """Format percentage change with sign."""
     if before == 0:
         return "N/A"
     percent = ((after - before) / before) * 100
-    return f"{'+' if percent >= 0 else ''}{percent:,.1f}%"
+    return _PCT_FMT(percent)
+
+def _print_json(result: SimulationResult) -> None:
+    """Print a simulation result as JSON, bypassing Rich rendering."""
+    typer.echo(json.dumps(result.to_dict()))
 
 def _display_simulation_result(result):
     """Display simulation results in a clean, financial format."""
@@ -4,13 +4,21 @@ Configuration management and loading.
 Handles application settings and environment variables.
 """
 
+import os
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _SafeLoader
+
 
 class BreachAction(Enum):
     """Actions to take when guardrails are breached."""
@@ -50,7 +58,7 @@ class FeatureGuardrailConfig:
 class GuardrailConfig:
     """Complete guardrail configuration."""
     budget: BudgetConfig
-    features: Dict[str, FeatureGuardrailConfig]
+    features: Mapping[str, FeatureGuardrailConfig]
     defaults: FeatureGuardrailConfig
     
     def get_feature_config(self, feature: str) -> FeatureGuardrailConfig:
@@ -58,12 +66,24 @@ class GuardrailConfig:
         return self.features.get(feature, self.defaults)
 
 
+_ALLOWED_TOP_KEYS = frozenset({'budget', 'features', 'defaults'})
+_ALLOWED_BUDGET_KEYS = frozenset({'daily', 'monthly'})
+_ALLOWED_FEATURE_KEYS = frozenset({'max_cost_per_request', 'action_on_breach'})
+_ACTION_BY_VALUE = {action.value: action for action in BreachAction}
+_VALID_ACTIONS = list(_ACTION_BY_VALUE)
+_MISSING = object()
+
+
 def load_guardrail_config(path: str) -> GuardrailConfig:
     """Load and validate guardrail configuration from YAML file.
     
     Strict validation ensures no silent misconfigurations that could
     lead to unexpected cost overruns or security issues.
     
+    Parsed configurations are cached per file and reused until the file's
+    modification time or size changes. The returned object is immutable,
+    so it is safe to share between callers.
+    
     Args:
         path: Path to YAML configuration file
         
@@ -76,22 +96,62 @@ def load_guardrail_config(path: str) -> GuardrailConfig:
         ValueError: If configuration is invalid
     """
     config_path = Path(path)
-    if not config_path.exists():
+    try:
+        stat = os.stat(config_path)
+    except FileNotFoundError:
         raise FileNotFoundError(f"Guardrail config file not found: {path}")
     
-    # Load YAML content
-    with open(config_path, 'r', encoding='utf-8') as f:
+    return _load_guardrail_config_cached(
+        str(config_path.resolve()), stat.st_mtime_ns, stat.st_size
+    )
+
+
+@lru_cache(maxsize=32)
+def _load_guardrail_config_cached(path: str, mtime_ns: int, size: int) -> GuardrailConfig:
+    """Parse and validate a config file, keyed by path, mtime and size.
+    
+    The mtime and size arguments are only part of the cache key so that
+    edits to the file invalidate the cached entry.
+    """
+    return _validate_config(_read_yaml(path))
+
+
+def _read_yaml(path: str):
+    """Read and parse a YAML config file without validating it.
+    
+    Args:
+        path: Path to YAML configuration file
+        
+    Returns:
+        The parsed YAML document
+        
+    Raises:
+        yaml.YAMLError: If YAML is invalid
+    """
+    with open(path, 'r', encoding='utf-8') as f:
         try:
-            raw_config = yaml.safe_load(f)
+            return yaml.load(f, Loader=_SafeLoader)
         except yaml.YAMLError as e:
             raise yaml.YAMLError(f"Invalid YAML in config file {path}: {e}")
+
+
+def _validate_config(raw_config) -> GuardrailConfig:
+    """Validate parsed configuration data and build a GuardrailConfig.
     
+    Args:
+        raw_config: Parsed configuration document
+        
+    Returns:
+        Validated GuardrailConfig object
+        
+    Raises:
+        ValueError: If configuration is invalid
+    """
     if not raw_config:
         raise ValueError("Configuration file is empty")
     
     # Validate top-level structure
-    allowed_top_keys = {'budget', 'features', 'defaults'}
-    unknown_keys = set(raw_config.keys()) - allowed_top_keys
+    unknown_keys = raw_config.keys() - _ALLOWED_TOP_KEYS
     if unknown_keys:
         raise ValueError(f"Unknown configuration keys: {unknown_keys}")
     
@@ -103,8 +163,7 @@ def load_guardrail_config(path: str) -> GuardrailConfig:
     if not isinstance(budget_data, dict):
         raise ValueError("'budget' must be a dictionary")
     
-    allowed_budget_keys = {'daily', 'monthly'}
-    unknown_budget_keys = set(budget_data.keys()) - allowed_budget_keys
+    unknown_budget_keys = budget_data.keys() - _ALLOWED_BUDGET_KEYS
     if unknown_budget_keys:
         raise ValueError(f"Unknown budget keys: {unknown_budget_keys}")
     
@@ -141,7 +200,7 @@ def load_guardrail_config(path: str) -> GuardrailConfig:
     
     return GuardrailConfig(
         budget=budget,
-        features=features,
+        features=MappingProxyType(features),
         defaults=defaults
     )
 
@@ -159,32 +218,29 @@ def _parse_feature_config(data: Dict, path: str) -> FeatureGuardrailConfig:
     Raises:
         ValueError: If configuration is invalid
     """
-    allowed_keys = {'max_cost_per_request', 'action_on_breach'}
-    unknown_keys = set(data.keys()) - allowed_keys
+    unknown_keys = data.keys() - _ALLOWED_FEATURE_KEYS
     if unknown_keys:
         raise ValueError(f"Unknown keys in {path}: {unknown_keys}")
     
     # Validate max_cost_per_request
-    if 'max_cost_per_request' not in data:
+    max_cost = data.get('max_cost_per_request', _MISSING)
+    if max_cost is _MISSING:
         raise ValueError(f"Missing required 'max_cost_per_request' in {path}")
     
-    max_cost = data['max_cost_per_request']
     if not isinstance(max_cost, (int, float)) or max_cost <= 0:
         raise ValueError(f"'max_cost_per_request' in {path} must be > 0")
     
     # Validate action_on_breach
-    if 'action_on_breach' not in data:
+    action_str = data.get('action_on_breach', _MISSING)
+    if action_str is _MISSING:
         raise ValueError(f"Missing required 'action_on_breach' in {path}")
     
-    action_str = data['action_on_breach']
     if not isinstance(action_str, str):
         raise ValueError(f"'action_on_breach' in {path} must be a string")
     
-    try:
-        action = BreachAction(action_str.lower())
-    except ValueError:
-        valid_actions = [action.value for action in BreachAction]
-        raise ValueError(f"'action_on_breach' in {path} must be one of: {valid_actions}")
+    action = _ACTION_BY_VALUE.get(action_str.lower())
+    if action is None:
+        raise ValueError(f"'action_on_breach' in {path} must be one of: {_VALID_ACTIONS}")
     
     return FeatureGuardrailConfig(
         max_cost_per_request=float(max_cost),
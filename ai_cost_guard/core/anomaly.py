@@ -4,6 +4,7 @@ Anomaly detection for cost patterns.
 Identifies unusual spending behavior and potential issues.
 """
 
+import sys
 from dataclasses import dataclass
 from enum import Enum
 from typing import List
@@ -18,9 +19,18 @@ class AnomalySeverity(Enum):
     CRITICAL = "critical"
 
 
+_CRITICAL = AnomalySeverity.CRITICAL
+_WARNING = AnomalySeverity.WARNING
+_COLD = BaselineState.COLD
+
+
 @dataclass(frozen=True)
 class AnomalyEvent:
     """Detected anomaly with details and explanation."""
+    __slots__ = (
+        'feature', 'model', 'rule', 'severity',
+        'observed_value', 'baseline_value', 'threshold', 'message'
+    )
     feature: str
     model: str
     rule: str  # "A", "B", or "C"
@@ -52,68 +62,61 @@ def detect_anomalies(
         
     Returns:
         List of detected anomalies (empty if none)
-        
-    Raises:
-        ValueError: If required metrics are missing
     """
-    if baseline.state == BaselineState.COLD:
+    if baseline.state is _COLD:
         return []
 
-    # Validate required fields
-    if not hasattr(current_event, 'estimated_cost') or current_event.estimated_cost is None:
-        raise ValueError("Current event missing estimated_cost")
-    if not hasattr(current_event, 'total_tokens') or current_event.total_tokens is None:
-        raise ValueError("Current event missing total_tokens")
-    if not hasattr(current_event, 'retry_count') or current_event.retry_count is None:
-        raise ValueError("Current event missing retry_count")
-
+    metrics = baseline.metrics
+    feature = sys.intern(feature)
+    model = sys.intern(model)
+    # Required fields are guaranteed non-None by LLMUsageEvent itself
     anomalies = []
     
     # Rule A: Cost Spike (CRITICAL)
-    if baseline.metrics.p90_cost is not None:
-        threshold = baseline.metrics.p90_cost * 1.5
+    if metrics.p90_cost is not None:
+        threshold = metrics.p90_cost * 1.5
         if current_event.estimated_cost > threshold:
             anomalies.append(AnomalyEvent(
                 feature=feature,
                 model=model,
                 rule="A",
-                severity=AnomalySeverity.CRITICAL,
+                severity=_CRITICAL,
                 observed_value=current_event.estimated_cost,
-                baseline_value=baseline.metrics.p90_cost,
+                baseline_value=metrics.p90_cost,
                 threshold=threshold,
-                message=f"Cost spike detected: ${current_event.estimated_cost:.2f} (P90: ${baseline.metrics.p90_cost:.2f} * 1.5 = ${threshold:.2f})"
+                message=f"Cost spike detected: ${current_event.estimated_cost:.2f} (P90: ${metrics.p90_cost:.2f} * 1.5 = ${threshold:.2f})"
             ))
     
     # Rule B: Token Explosion (WARNING)
-    if baseline.metrics.median_tokens is not None:
-        threshold = baseline.metrics.median_tokens * 1.7
+    if metrics.median_tokens is not None:
+        threshold = metrics.median_tokens * 1.7
         if current_event.total_tokens > threshold:
             anomalies.append(AnomalyEvent(
                 feature=feature,
                 model=model,
                 rule="B",
-                severity=AnomalySeverity.WARNING,
+                severity=_WARNING,
                 observed_value=current_event.total_tokens,
-                baseline_value=baseline.metrics.median_tokens,
+                baseline_value=metrics.median_tokens,
                 threshold=threshold,
-                message=f"High token usage: {current_event.total_tokens:,} (Median: {baseline.metrics.median_tokens:,} * 1.7 = {threshold:,.0f})"
+                message=f"High token usage: {current_event.total_tokens:,} (Median: {metrics.median_tokens:,} * 1.7 = {threshold:,.0f})"
             ))
     
     # Rule C: Retry Amplification (WARNING)
-    if (baseline.metrics.p90_cost is not None and 
+    if (metrics.p90_cost is not None and 
         current_event.retry_count > 1):
-        threshold = baseline.metrics.p90_cost * 1.3
+        threshold = metrics.p90_cost * 1.3
         total_cost = current_event.estimated_cost * current_event.retry_count
         if total_cost > threshold:
             anomalies.append(AnomalyEvent(
                 feature=feature,
                 model=model,
                 rule="C",
-                severity=AnomalySeverity.WARNING,
+                severity=_WARNING,
                 observed_value=total_cost,
-                baseline_value=baseline.metrics.p90_cost,
+                baseline_value=metrics.p90_cost,
                 threshold=threshold,
-                message=f"Retry amplification: ${total_cost:.2f} (${current_event.estimated_cost:.2f} * {current_event.retry_count} retries) > ${threshold:.2f} (P90: ${baseline.metrics.p90_cost:.2f} * 1.3)"
+                message=f"Retry amplification: ${total_cost:.2f} (${current_event.estimated_cost:.2f} * {current_event.retry_count} retries) > ${threshold:.2f} (P90: ${metrics.p90_cost:.2f} * 1.3)"
             ))
     
     return anomalies
@@ -4,14 +4,20 @@ Baseline cost analysis and comparison.
 Establishes normal usage patterns for anomaly detection.
 """
 
+from bisect import bisect_left
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import List
+from operator import attrgetter
+from typing import List, Sequence
 
 from ai_cost_guard.storage.models import LLMUsageEvent
 
 
+# C-level sort key; avoids a Python lambda call per event
+_timestamp_key = attrgetter("timestamp")
+
+
 class BaselineState(Enum):
     """State of baseline computation based on data availability."""
     COLD = "cold"  # Insufficient data for reliable baseline
@@ -21,6 +27,7 @@ class BaselineState(Enum):
 @dataclass(frozen=True)
 class BaselineMetrics:
     """Statistical metrics computed from usage events."""
+    __slots__ = ('median_cost', 'p90_cost', 'median_tokens', 'sample_count')
     median_cost: float
     p90_cost: float
     median_tokens: int
@@ -41,6 +48,7 @@ class BaselineMetrics:
 @dataclass(frozen=True)
 class BaselineResult:
     """Complete baseline computation result."""
+    __slots__ = ('metrics', 'state', 'window_start', 'window_end')
     metrics: BaselineMetrics
     state: BaselineState
     window_start: datetime
@@ -59,6 +67,8 @@ def compute_baseline(events: List[LLMUsageEvent]) -> BaselineResult:
     and provide stable baselines for anomaly detection. Medians represent
     typical behavior without being skewed by expensive edge cases.
     
+    Events may be supplied in any order.
+    
     Args:
         events: List of usage events (assumed filtered by feature + model)
         
@@ -66,30 +76,24 @@ def compute_baseline(events: List[LLMUsageEvent]) -> BaselineResult:
         BaselineResult with computed metrics and state
         
     Raises:
-        ValueError: If events list is empty or contains invalid data
+        ValueError: If events list is empty or no event is within the window
     """
     if not events:
         raise ValueError("Events list cannot be empty")
     
-    # Validate all events have required cost data
-    for i, event in enumerate(events):
-        if not hasattr(event, 'estimated_cost') or event.estimated_cost is None:
-            raise ValueError(f"Event at index {i} missing estimated_cost")
-    
     # Sort events by timestamp (newest first) for deterministic processing
-    sorted_events = sorted(events, key=lambda e: e.timestamp, reverse=True)
+    sorted_events = sorted(events, key=_timestamp_key, reverse=True)
     
     # Apply time window (last 7 days) and event limit (200 events)
     now = datetime.now()
     seven_days_ago = now - timedelta(days=7)
     
-    filtered_events = []
-    for event in sorted_events:
-        if event.timestamp < seven_days_ago:
-            break  # Stop when we reach events older than 7 days
-        filtered_events.append(event)
-        if len(filtered_events) >= 200:
-            break  # Stop at 200 events
+    # sorted_events is newest first, so events inside the window form a
+    # prefix; only the newest 200 can be kept, so binary search that slice
+    newest = sorted_events[:200]
+    ascending_timestamps = [event.timestamp for event in reversed(newest)]
+    in_window = len(newest) - bisect_left(ascending_timestamps, seven_days_ago)
+    filtered_events = newest[:in_window]
     
     if not filtered_events:
         raise ValueError("No events found within 7-day window")
@@ -101,10 +105,13 @@ def compute_baseline(events: List[LLMUsageEvent]) -> BaselineResult:
     costs = [event.estimated_cost for event in filtered_events]
     tokens = [event.total_tokens for event in filtered_events]
     
-    # Compute exact percentiles (no approximation)
-    median_cost = _compute_exact_percentile(costs, 50)
-    p90_cost = _compute_exact_percentile(costs, 90)
-    median_tokens = _compute_exact_percentile(tokens, 50)
+    # Compute exact percentiles (no approximation); the lists are freshly
+    # built above, so each is sorted once in place and interpolated directly
+    costs.sort()
+    tokens.sort()
+    median_cost = _interpolate_sorted(costs, 50)
+    p90_cost = _interpolate_sorted(costs, 90)
+    median_tokens = _interpolate_sorted(tokens, 50)
     
     # Determine time window
     window_end = filtered_events[0].timestamp  # Most recent event
@@ -144,8 +151,19 @@ def _compute_exact_percentile(values: List[float], percentile: int) -> float:
     if percentile < 0 or percentile > 100:
         raise ValueError("Percentile must be between 0 and 100")
     
-    # Sort values for percentile computation
-    sorted_values = sorted(values)
+    return _interpolate_sorted(sorted(values), percentile)
+
+
+def _interpolate_sorted(sorted_values: Sequence[float], percentile: float) -> float:
+    """Linearly interpolate a percentile from already sorted, non-empty values.
+    
+    Args:
+        sorted_values: Values in ascending order
+        percentile: Percentile to compute (0-100)
+        
+    Returns:
+        Exact percentile value
+    """
     n = len(sorted_values)
     
     # Convert percentile to position (0-indexed)
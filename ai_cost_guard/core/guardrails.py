@@ -10,7 +10,7 @@ Enforcement Order:
 """
 
 from dataclasses import dataclass
-from enum import Enum, auto
+from enum import IntEnum
 from typing import List, Optional
 
 from .anomaly import AnomalyEvent, AnomalySeverity
@@ -18,13 +18,26 @@ from .baseline import BaselineResult, BaselineState
 from ai_cost_guard.storage.models import LLMUsageEvent
 
 
-class EnforcementAction(Enum):
-    """Available enforcement actions in order of severity."""
-    ALLOW = auto()    # Allow the request (no action)
-    WARN = auto()      # Log warning but allow request
-    DOWNGRADE = auto() # Suggest using a cheaper model
-    THROTTLE = auto()  # Delay or rate-limit the request
-    BLOCK = auto()     # Reject the request entirely
+class EnforcementAction(IntEnum):
+    """Available enforcement actions in order of severity.
+    
+    Members compare as integers, so a more severe action is always greater.
+    Values are distinct bits so sets of actions can be OR-ed into a mask.
+    """
+    ALLOW = 0       # Allow the request (no action)
+    WARN = 1        # Log warning but allow request
+    DOWNGRADE = 2   # Suggest using a cheaper model
+    THROTTLE = 4    # Delay or rate-limit the request
+    BLOCK = 8       # Reject the request entirely
+
+
+# Module-level aliases keep enum attribute lookups off the enforcement path
+_ALLOW = EnforcementAction.ALLOW
+_THROTTLE = EnforcementAction.THROTTLE
+_BLOCK = EnforcementAction.BLOCK
+_CRITICAL = AnomalySeverity.CRITICAL
+_WARNING = AnomalySeverity.WARNING
+_WARM = BaselineState.WARM
 
 
 class GuardrailViolation(Exception):
@@ -37,6 +50,7 @@ class GuardrailViolation(Exception):
 @dataclass
 class BudgetState:
     """Current budget state for a feature or model."""
+    __slots__ = ('amount_used', 'amount_remaining', 'budget_period_days')
     amount_used: float
     amount_remaining: float
     budget_period_days: int
@@ -84,49 +98,54 @@ def enforce_guardrails(
     Raises:
         GuardrailViolation: If BLOCK or THROTTLE action is required
     """
-    action_taken = EnforcementAction.ALLOW  # Default to no action
+    action_taken = _ALLOW  # Default to no action
     message = ""
 
-    def _update_action(new_action: EnforcementAction, new_message: str) -> None:
-        nonlocal action_taken, message
-        if new_action.value > action_taken.value:
-            action_taken = new_action
-            message = new_message
+    # Messages are only formatted when a check escalates the action, so
+    # checks that do not change the outcome cost a single comparison.
+    # BLOCK is the most severe action, so once it is reached no later check
+    # can change the outcome (or its message) and we raise immediately.
 
     # 1. Check per-request max cost
     if (config.max_cost_per_request is not None and 
             current_event.estimated_cost > config.max_cost_per_request):
-        action = EnforcementAction.BLOCK
-        msg = (
+        message = (
             f"Request cost ${current_event.estimated_cost:.4f} exceeds "
             f"maximum allowed ${config.max_cost_per_request:.4f} for {feature}/{model}"
         )
-        _update_action(action, msg)
+        raise GuardrailViolation(message, _BLOCK)
 
     # 2. Check budget limits
     if (config.budget_limit is not None and 
             budget_state.amount_remaining <= 0):
         action = config.on_budget_breach
-        msg = (
-            f"Budget limit of ${config.budget_limit:.2f} reached for {feature}. "
-            f"Current spend: ${budget_state.amount_used:.2f}"
-        )
-        _update_action(action, msg)
+        if action > action_taken:
+            action_taken = action
+            message = (
+                f"Budget limit of ${config.budget_limit:.2f} reached for {feature}. "
+                f"Current spend: ${budget_state.amount_used:.2f}"
+            )
+            if action_taken is _BLOCK:
+                raise GuardrailViolation(message, action_taken)
 
     # 3. Check for critical anomalies (only if baseline is WARM)
-    if baseline.state == BaselineState.WARM:
+    if baseline.state is _WARM:
+        on_critical = config.on_critical_anomaly
+        on_warning = config.on_warning_anomaly
         for anomaly in anomalies:
-            if anomaly.severity == AnomalySeverity.CRITICAL:
-                action = config.on_critical_anomaly
-                msg = f"Critical anomaly detected in {feature}/{model}: {anomaly.message}"
-                _update_action(action, msg)
-            elif anomaly.severity == AnomalySeverity.WARNING:
-                action = config.on_warning_anomaly
-                msg = f"Warning anomaly in {feature}/{model}: {anomaly.message}"
-                _update_action(action, msg)
-
-    # If we have a blocking action, raise an exception
-    if action_taken in (EnforcementAction.BLOCK, EnforcementAction.THROTTLE):
+            if anomaly.severity is _CRITICAL:
+                if on_critical > action_taken:
+                    action_taken = on_critical
+                    message = f"Critical anomaly detected in {feature}/{model}: {anomaly.message}"
+            elif anomaly.severity is _WARNING:
+                if on_warning > action_taken:
+                    action_taken = on_warning
+                    message = f"Warning anomaly in {feature}/{model}: {anomaly.message}"
+            if action_taken is _BLOCK:
+                raise GuardrailViolation(message, action_taken)
+
+    # THROTTLE is also enforced by raising
+    if action_taken is _THROTTLE:
         raise GuardrailViolation(message, action_taken)
 
     return action_taken
@@ -6,16 +6,60 @@ Handles cost computations for various AI models and services.
 
 from dataclasses import dataclass
 from typing import Dict
-from decimal import Decimal, ROUND_UP
+from decimal import Decimal
 
 from .token_counter import TokenUsage
 
 
+# Rates are held as integer millionths of a dollar per 1K tokens so that
+# costs can be computed and rounded exactly without Decimal arithmetic
+_RATE_SCALE = 1_000_000
+# Integer cost units (rate units * tokens) per cent: 1K tokens * 10^6 / 100
+_UNITS_PER_CENT = 1000 * _RATE_SCALE // 100
+
+
+def _scaled_rate(rate: Decimal) -> int:
+    """Convert a per-1K Decimal rate to integer millionths of a dollar."""
+    scaled = rate * _RATE_SCALE
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"Rate {rate} has more than 6 decimal places")
+    return int(scaled)
+
+
 @dataclass(frozen=True)
 class ModelPricing:
     """Per-token pricing for a specific model."""
+    __slots__ = (
+        'prompt_cost_per_1k', 'completion_cost_per_1k',
+        '_prompt_rate', '_completion_rate'
+    )
     prompt_cost_per_1k: Decimal  # Cost per 1K prompt tokens
     completion_cost_per_1k: Decimal  # Cost per 1K completion tokens
+    
+    def __post_init__(self):
+        """Precompute exact integer rates used by calculate_cost."""
+        object.__setattr__(self, "_prompt_rate", _scaled_rate(self.prompt_cost_per_1k))
+        object.__setattr__(self, "_completion_rate", _scaled_rate(self.completion_cost_per_1k))
+    
+    def cost_for(self, usage: TokenUsage) -> float:
+        """Calculate total cost of usage at this model's rates.
+        
+        Args:
+            usage: Token usage data
+            
+        Returns:
+            Total cost rounded UP to 2 decimal places
+        """
+        # Exact integer cost in rate units: tokens * millionths-of-$ per 1K
+        total_units = (
+            usage.prompt_tokens * self._prompt_rate
+            + usage.completion_tokens * self._completion_rate
+        )
+        
+        # Conservative rounding (always round UP) to whole cents
+        cents = -(-total_units // _UNITS_PER_CENT)
+        
+        return cents / 100
 
 
 @dataclass(frozen=True)
@@ -35,9 +79,11 @@ class PricingTable:
         Raises:
             ValueError: If model is not supported
         """
-        if model not in self.prices:
-            raise ValueError(f"Unsupported model: {model}")
-        return self.prices[model]
+        # Supported models are the common case; pay for the miss only on error
+        try:
+            return self.prices[model]
+        except KeyError:
+            raise ValueError(f"Unsupported model: {model}") from None
 
 
 # Fixed pricing table - no dynamic fetching, no defaults
@@ -70,16 +116,4 @@ def calculate_cost(model: str, usage: TokenUsage) -> float:
     Raises:
         ValueError: If model is not supported
     """
-    pricing = PRICING_TABLE.get_pricing(model)
-    
-    # Calculate prompt cost: (tokens / 1000) * cost_per_1k
-    prompt_cost = (Decimal(usage.prompt_tokens) / Decimal("1000")) * pricing.prompt_cost_per_1k
-    
-    # Calculate completion cost: (tokens / 1000) * cost_per_1k
-    completion_cost = (Decimal(usage.completion_tokens) / Decimal("1000")) * pricing.completion_cost_per_1k
-    
-    # Total cost with conservative rounding (always round UP)
-    total_cost = prompt_cost + completion_cost
-    rounded_cost = total_cost.quantize(Decimal("0.01"), rounding=ROUND_UP)
-    
-    return float(rounded_cost)
+    return PRICING_TABLE.get_pricing(model).cost_for(usage)
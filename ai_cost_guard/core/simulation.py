@@ -11,10 +11,11 @@ Simulation mirrors runtime behavior but with these key differences:
 4. No automatic remediation or fixes
 """
 
+from collections import defaultdict
 from dataclasses import dataclass, field
+from datetime import datetime
 from enum import Enum, auto
-from typing import Dict, List, Optional, Tuple
-import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
 
 from .anomaly import detect_anomalies, AnomalyEvent, AnomalySeverity
 from .baseline import BaselineResult, BaselineState, BaselineMetrics
@@ -22,10 +23,11 @@ from .guardrails import (
     enforce_guardrails, 
     EnforcementAction, 
     GuardrailConfig,
+    GuardrailViolation,
     BudgetState
 )
 from ai_cost_guard.storage.models import LLMUsageEvent
-from ai_cost_guard.storage.repository import UsageRepository
+from ai_cost_guard.storage.repository import UsageRepository, rows_to_events
 
 
 class SimulationVerdict(Enum):
@@ -43,6 +45,29 @@ class FeatureSimulationResult:
     estimated_monthly_cost: float
     anomalies: List[AnomalyEvent] = field(default_factory=list)
     violations: List[Tuple[EnforcementAction, str]] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of this result."""
+        return {
+            "feature": self.feature,
+            "model": self.model,
+            "estimated_monthly_cost": self.estimated_monthly_cost,
+            "anomalies": [
+                {
+                    "rule": anomaly.rule,
+                    "severity": anomaly.severity.value,
+                    "observed_value": anomaly.observed_value,
+                    "baseline_value": anomaly.baseline_value,
+                    "threshold": anomaly.threshold,
+                    "message": anomaly.message
+                }
+                for anomaly in self.anomalies
+            ],
+            "violations": [
+                {"action": action.name, "message": message}
+                for action, message in self.violations
+            ]
+        }
 
 
 @dataclass
@@ -51,6 +76,16 @@ class SimulationResult:
     per_feature_results: List[FeatureSimulationResult]
     overall_verdict: SimulationVerdict
     estimated_monthly_impact: float
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation of this result."""
+        return {
+            "overall_verdict": self.overall_verdict.name,
+            "estimated_monthly_impact": self.estimated_monthly_impact,
+            "per_feature_results": [
+                result.to_dict() for result in self.per_feature_results
+            ]
+        }
 
 
 def simulate_cost_impact(
@@ -72,50 +107,34 @@ def simulate_cost_impact(
     Returns:
         SimulationResult containing per-feature results and overall verdict
     """
-    try:
-        # Get recent usage events (last 30 days by default)
-        events = repository.get_recent_events(
-            feature=feature,
-            days=30
-        )
-    except sqlite3.OperationalError as e:
-        # Handle case when table doesn't exist
-        if "no such table" in str(e).lower():
-            return SimulationResult(
-                per_feature_results=[],
-                overall_verdict=SimulationVerdict.PASS,
-                estimated_monthly_impact=0.0
-            )
-        raise
+    # An uninitialized database simply has no history to simulate
+    if not repository.schema_initialized():
+        return _empty_result()
     
-    if not events:
-        return SimulationResult(
-            per_feature_results=[],
-            overall_verdict=SimulationVerdict.PASS,
-            estimated_monthly_impact=0.0
-        )
+    # Get recent usage events (last 30 days by default)
+    # Raw rows are enough for grouping; only one event per group is built
+    rows = repository.get_recent_rows(
+        feature=feature,
+        days=30
+    )
     
-    if not events:
-        return SimulationResult(
-            per_feature_results=[],
-            overall_verdict=SimulationVerdict.PASS,
-            estimated_monthly_impact=0.0
-        )
+    if not rows:
+        return _empty_result()
     
-    # Group events by (feature, model) for simulation
-    events_by_feature: Dict[Tuple[str, str], List[LLMUsageEvent]] = {}
-    for event in events:
-        key = (event.feature, event.model)
-        events_by_feature.setdefault(key, []).append(event)
+    # Group rows by (feature, model), accumulating everything the
+    # simulation needs per group in the same pass
+    groups: Dict[Tuple[str, str], _EventGroup] = defaultdict(_EventGroup)
+    for row in rows:
+        groups[(row[1], row[2])].add(row)
     
     # Simulate each feature-model combination
     results = []
-    for (feature_name, model), feature_events in events_by_feature.items():
+    for (feature_name, model), group in groups.items():
         # Use most recent event as basis for simulation
-        latest_event = feature_events[-1]
+        latest_event = rows_to_events((group.last_row,))[0]
         
         # Create a baseline from historical data
-        baseline = _create_baseline_from_events(feature_events)
+        baseline = _create_baseline_from_group(group)
         
         # Run anomaly detection
         anomalies: List[AnomalyEvent] = []
@@ -138,7 +157,7 @@ def simulate_cost_impact(
         )
         
         # Calculate estimated monthly cost
-        daily_avg = sum(e.estimated_cost for e in feature_events) / 30
+        daily_avg = group.total_cost / 30
         estimated_monthly = daily_avg * 30
         
         results.append(FeatureSimulationResult(
@@ -160,30 +179,87 @@ def simulate_cost_impact(
     )
 
 
-def _create_baseline_from_events(events: List[LLMUsageEvent]) -> BaselineResult:
-    """Create a baseline from historical events."""
-    if len(events) < 3:  # Reduced threshold for testing
+# Actions that fail a simulation: BLOCK or THROTTLE anywhere
+_FAILING_ACTIONS = EnforcementAction.BLOCK | EnforcementAction.THROTTLE
+
+
+def _empty_result() -> SimulationResult:
+    """Result for a simulation with no usage history.
+    
+    Built fresh on each call because SimulationResult is mutable.
+    """
+    return SimulationResult(
+        per_feature_results=[],
+        overall_verdict=SimulationVerdict.PASS,
+        estimated_monthly_impact=0.0
+    )
+
+
+class _EventGroup:
+    """Per-(feature, model) aggregates collected in one pass over ledger rows.
+    
+    Rows are in UsageRepository.get_recent_rows column order. Window bounds
+    are kept as ISO-8601 text, which orders like the timestamps themselves,
+    and are parsed only when a baseline is built.
+    """
+    __slots__ = (
+        'costs', 'tokens', 'total_cost',
+        'window_start', 'window_end', 'last_row'
+    )
+    
+    def __init__(self):
+        self.costs: List[float] = []
+        self.tokens: List[int] = []
+        self.total_cost = 0.0
+        self.window_start: Optional[str] = None
+        self.window_end: Optional[str] = None
+        self.last_row: Optional[tuple] = None
+    
+    def add(self, row: tuple) -> None:
+        timestamp, _, _, _, _, total_tokens, cost, _, _ = row
+        self.costs.append(cost)
+        self.tokens.append(total_tokens)
+        self.total_cost += cost
+        if self.last_row is None:
+            self.window_start = self.window_end = timestamp
+        elif timestamp < self.window_start:
+            self.window_start = timestamp
+        elif timestamp > self.window_end:
+            self.window_end = timestamp
+        self.last_row = row
+
+
+def _create_baseline_from_group(group: _EventGroup) -> BaselineResult:
+    """Create a baseline from one group's pre-aggregated events."""
+    costs = group.costs
+    tokens = group.tokens
+    n = len(costs)
+    window_start = datetime.fromisoformat(group.window_start)
+    window_end = datetime.fromisoformat(group.window_end)
+    
+    # COLD needs no reduction at all; the window was tracked while grouping
+    if n < 3:  # Reduced threshold for testing
         return BaselineResult(
             metrics=None,
             state=BaselineState.COLD,
-            window_start=min(e.timestamp for e in events) if events else None,
-            window_end=max(e.timestamp for e in events) if events else None
+            window_start=window_start,
+            window_end=window_end
         )
     
     # Simple baseline calculation (in a real implementation, use proper statistics)
-    costs = sorted(e.estimated_cost for e in events)
-    tokens = sorted(e.total_tokens for e in events)
+    costs.sort()
+    tokens.sort()
     
     return BaselineResult(
         metrics=BaselineMetrics(
-            median_cost=costs[len(costs)//2],
-            p90_cost=costs[int(len(costs) * 0.9)],
-            median_tokens=tokens[len(tokens)//2],
-            sample_count=len(events)
+            median_cost=costs[n // 2],
+            p90_cost=costs[int(n * 0.9)],
+            median_tokens=tokens[n // 2],
+            sample_count=n
         ),
         state=BaselineState.WARM,
-        window_start=min(e.timestamp for e in events),
-        window_end=max(e.timestamp for e in events)
+        window_start=window_start,
+        window_end=window_end
     )
 
 
@@ -225,8 +301,9 @@ def _simulate_enforcement(
         if action != EnforcementAction.ALLOW:
             violations.append((action, f"Simulated {action.name.lower()}"))
             
-    except Exception as e:
-        # Capture any violations that would have been raised
+    except GuardrailViolation as e:
+        # Capture violations that would have been raised; anything else is
+        # a bug and must not be reported as a verdict
         violations.append((e.action, str(e)))
     
     return violations
@@ -236,18 +313,14 @@ def _determine_overall_verdict(
     results: List[FeatureSimulationResult]
 ) -> SimulationVerdict:
     """Determine the overall simulation verdict based on results."""
-    has_blocking = False
-    has_warnings = False
-    
+    # OR every action into one bit mask, then test it once
+    mask = 0
     for result in results:
         for action, _ in result.violations:
-            if action in (EnforcementAction.BLOCK, EnforcementAction.THROTTLE):
-                has_blocking = True
-            elif action == EnforcementAction.WARN:
-                has_warnings = True
+            mask |= action
     
-    if has_blocking:
+    if mask & _FAILING_ACTIONS:
         return SimulationVerdict.FAIL
-    elif has_warnings:
+    elif mask & EnforcementAction.WARN:
         return SimulationVerdict.WARN
     return SimulationVerdict.PASS
@@ -13,6 +13,7 @@ class TokenUsage:
     
     Contains exact token counts without estimation or model-specific logic.
     """
+    __slots__ = ('prompt_tokens', 'completion_tokens')
     prompt_tokens: int
     completion_tokens: int
     
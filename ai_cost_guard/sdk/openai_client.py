@@ -4,15 +4,17 @@ Guarded OpenAI client wrapper.
 Records usage events for cost tracking without modifying behavior.
 """
 
+import sys
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from openai import OpenAI
 
-from ..core.pricing import calculate_cost
+from ..core.pricing import PRICING_TABLE
 from ..core.token_counter import TokenUsage
 from ..storage.models import LLMUsageEvent
 from ..storage.repository import insert_usage_event
+from ..storage.writer import UsageWriter
 
 
 class GuardedOpenAI:
@@ -22,26 +24,49 @@ class GuardedOpenAI:
     All failures are loud to ensure no silent data loss.
     """
     
-    def __init__(self, model: str, feature: str, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        model: str,
+        feature: str,
+        db_path: Optional[str] = None,
+        batch_size: int = 1
+    ):
         """Initialize guarded OpenAI client.
         
         Args:
             model: OpenAI model name (required)
             feature: Feature identifier for tracking (required)
             db_path: Database file path (defaults to ".ai-cost-guard.db")
+            batch_size: Number of usage events to buffer before writing them
+                in one transaction. The default of 1 writes every event
+                immediately; larger values trade durability of the last
+                few events for throughput (call flush() or close()).
             
         Raises:
-            ValueError: If model or feature is missing/empty
+            ValueError: If model or feature is missing/empty, batch_size is
+                less than 1, or the model has no pricing
         """
         if not model or not model.strip():
             raise ValueError("model is required and cannot be empty")
         if not feature or not feature.strip():
             raise ValueError("feature is required and cannot be empty")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
         
-        self.model = model
-        self.feature = feature
+        # Interned so every recorded event shares one string object
+        self.model = sys.intern(model)
+        self.feature = sys.intern(feature)
         self.db_path = db_path or ".ai-cost-guard.db"
+        # The model is fixed, so resolve its pricing once; this also rejects
+        # unpriced models before any billable API call is made
+        self._pricing = PRICING_TABLE.get_pricing(self.model)
         self.client = OpenAI()
+        # Bound once; chat() is called per request
+        self._create = self.client.chat.completions.create
+        self._writer = (
+            UsageWriter(self.db_path, batch_size=batch_size)
+            if batch_size > 1 else None
+        )
     
     def chat(
         self,
@@ -72,12 +97,17 @@ class GuardedOpenAI:
         if not messages:
             raise ValueError("messages is required and cannot be empty")
         
+        # Only forward optional parameters that were actually set, so the
+        # API applies its own defaults for the rest
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        
         # Make OpenAI API call - any failure here stops execution
-        response = self.client.chat.completions.create(
+        response = self._create(
             model=self.model,
             messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
             **kwargs
         )
         
@@ -91,7 +121,7 @@ class GuardedOpenAI:
             prompt_tokens=usage.prompt_tokens,
             completion_tokens=usage.completion_tokens
         )
-        estimated_cost = calculate_cost(self.model, token_usage)
+        estimated_cost = self._pricing.cost_for(token_usage)
         
         # Create and store usage event - any failure here is loud
         event = LLMUsageEvent(
@@ -105,7 +135,26 @@ class GuardedOpenAI:
             request_id=response.id
         )
         
-        insert_usage_event(event, self.db_path)
+        if self._writer is not None:
+            self._writer.write(event)
+        else:
+            insert_usage_event(event, self.db_path)
         
         # Return original OpenAI response unchanged
         return response
+    
+    def flush(self) -> None:
+        """Write any buffered usage events to the database."""
+        if self._writer is not None:
+            self._writer.flush()
+    
+    def close(self) -> None:
+        """Flush buffered usage events and release the writer."""
+        if self._writer is not None:
+            self._writer.close()
+    
+    def __enter__(self) -> "GuardedOpenAI":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
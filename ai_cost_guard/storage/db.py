@@ -4,20 +4,86 @@ Database connection management.
 Provides SQLite connection for data persistence.
 """
 
+import atexit
 import sqlite3
+import threading
 from pathlib import Path
 
 
+# Per-thread cache of long-lived connections, keyed by database path
+_thread_local = threading.local()
+
+
 def get_connection(db_path: str = "ai_cost_guard.db") -> sqlite3.Connection:
     """Create and return a SQLite database connection with foreign keys enabled.
     
+    Once initialize_schema has switched the database to the WAL journal,
+    connections also use synchronous=NORMAL, which is safe in WAL mode and
+    avoids an fsync on every committed write. Databases in any other
+    journal mode keep SQLite's default.
+    
     Args:
         db_path: Path to SQLite database file
         
     Returns:
         SQLite connection with foreign key constraints enabled
     """
-    path = Path(db_path)
-    conn = sqlite3.connect(str(path))
+    conn = sqlite3.connect(str(Path(db_path)))
     conn.execute("PRAGMA foreign_keys = ON")
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+def get_cached_connection(db_path: str = "ai_cost_guard.db") -> sqlite3.Connection:
+    """Return a connection to db_path that is reused within the current thread.
+    
+    Opening a connection has a fixed cost and discards SQLite's page cache,
+    so repeated reads and writes (for example one per request) share a
+    single connection per thread instead. Callers must not close the returned
+    connection; use close_cached_connections for that.
+    
+    Args:
+        db_path: Path to SQLite database file
+        
+    Returns:
+        SQLite connection owned by the current thread
+    """
+    connections = getattr(_thread_local, "connections", None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = get_connection(db_path)
+        # Serve reads from memory-mapped pages where the platform allows it
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        connections[db_path] = conn
     return conn
+
+
+def close_cached_connection(db_path: str) -> None:
+    """Close the current thread's cached connection to db_path, if any.
+    
+    A shared-cache in-memory database is discarded once its last
+    connection closes, so this is how such a database is released.
+    """
+    connections = getattr(_thread_local, "connections", None)
+    if connections:
+        conn = connections.pop(db_path, None)
+        if conn is not None:
+            conn.close()
+
+
+def close_cached_connections() -> None:
+    """Close all connections cached for the current thread."""
+    connections = getattr(_thread_local, "connections", None)
+    if not connections:
+        return
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+
+atexit.register(close_cached_connections)
@@ -16,6 +16,9 @@ class LLMUsageEvent:
     
     Append-only events that create an auditable ledger of AI costs.
     Once written, these records must never be modified.
+    
+    estimated_cost, total_tokens and retry_count are validated here, once,
+    so downstream analysis can rely on them being present.
     """
     timestamp: datetime
     feature: str
@@ -26,3 +29,12 @@ class LLMUsageEvent:
     estimated_cost: float
     retry_count: int = 0
     request_id: Optional[str] = None
+    
+    def __post_init__(self):
+        """Validate the fields used for cost analysis are present."""
+        if self.estimated_cost is None:
+            raise ValueError("estimated_cost is required")
+        if self.total_tokens is None:
+            raise ValueError("total_tokens is required")
+        if self.retry_count is None:
+            raise ValueError("retry_count is required")
@@ -5,13 +5,63 @@ Handles database operations and data persistence logic.
 """
 
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Tuple
+from sys import intern as _intern
+from typing import Iterable, List, Optional, Dict, Tuple
 from dataclasses import dataclass
 
-from .db import get_connection
+from .db import get_cached_connection
 from .models import LLMUsageEvent
 
 
+_INSERT_EVENT_SQL = """
+    INSERT INTO llm_usage_event 
+    (timestamp, feature, model, prompt_tokens, completion_tokens, 
+     total_tokens, estimated_cost, retry_count, request_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def event_to_row(event: LLMUsageEvent) -> tuple:
+    """Convert a usage event into a row in ledger column order."""
+    return (
+        event.timestamp.isoformat(),
+        event.feature,
+        event.model,
+        event.prompt_tokens,
+        event.completion_tokens,
+        event.total_tokens,
+        event.estimated_cost,
+        event.retry_count,
+        event.request_id
+    )
+
+
+def rows_to_events(rows: Iterable[tuple]) -> List[LLMUsageEvent]:
+    """Build usage events from rows in ledger column order.
+    
+    Rows are unpacked straight into locals, and the constructor and
+    parsers are bound once, so materializing large fetches stays cheap.
+    """
+    event_cls = LLMUsageEvent
+    parse_ts = datetime.fromisoformat
+    intern = _intern
+    return [
+        event_cls(
+            timestamp=parse_ts(ts),
+            feature=intern(feature),
+            model=intern(model),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=total_tokens,
+            estimated_cost=estimated_cost,
+            retry_count=retry_count,
+            request_id=request_id
+        )
+        for (ts, feature, model, prompt_tokens, completion_tokens,
+             total_tokens, estimated_cost, retry_count, request_id) in rows
+    ]
+
+
 class UsageRepository:
     """Repository for accessing and managing LLM usage data.
     
@@ -26,6 +76,27 @@ class UsageRepository:
             db_path: Path to SQLite database file
         """
         self.db_path = db_path
+        self._schema_initialized = False
+    
+    def schema_initialized(self) -> bool:
+        """Check whether the usage ledger table exists.
+        
+        A positive result is remembered, since the append-only ledger is
+        never dropped; a negative one is re-checked so that running
+        initialization later is picked up.
+        
+        Returns:
+            True if the llm_usage_event table exists
+        """
+        if self._schema_initialized:
+            return True
+        conn = get_cached_connection(self.db_path)
+        row = conn.execute("""
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'table' AND name = 'llm_usage_event' LIMIT 1
+        """).fetchone()
+        self._schema_initialized = row is not None
+        return self._schema_initialized
     
     def get_recent_events(
         self,
@@ -45,51 +116,59 @@ class UsageRepository:
         Returns:
             List of usage events ordered by timestamp (newest first)
         """
-        conn = get_connection(self.db_path)
-        try:
-            query = """
-                SELECT timestamp, feature, model, prompt_tokens, 
-                       completion_tokens, total_tokens, estimated_cost, 
-                       retry_count, request_id 
-                FROM llm_usage_event
-            """
-            params = []
-            conditions = []
-            
-            if feature:
-                conditions.append("feature = ?")
-                params.append(feature)
-            if model:
-                conditions.append("model = ?")
-                params.append(model)
-            if days is not None:
-                cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-                conditions.append("timestamp >= ?")
-                params.append(cutoff)
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
+        return rows_to_events(self.get_recent_rows(feature, model, days, limit))
+    
+    def get_recent_rows(
+        self,
+        feature: Optional[str] = None,
+        model: Optional[str] = None,
+        days: Optional[int] = None,
+        limit: int = 1000
+    ) -> List[tuple]:
+        """Get recent usage rows without building event objects.
+        
+        Same selection as get_recent_events, for callers that only need a
+        few columns of most rows. Each row holds timestamp (ISO-8601 text),
+        feature, model, prompt_tokens, completion_tokens, total_tokens,
+        estimated_cost, retry_count and request_id, in that order.
+        
+        Args:
+            feature: Optional filter for specific feature
+            model: Optional filter for specific model
+            days: Optional number of days to look back
+            limit: Maximum number of rows to return
             
-            cursor = conn.execute(query, params)
-            events = []
-            for row in cursor.fetchall():
-                events.append(LLMUsageEvent(
-                    timestamp=datetime.fromisoformat(row[0]),
-                    feature=row[1],
-                    model=row[2],
-                    prompt_tokens=row[3],
-                    completion_tokens=row[4],
-                    total_tokens=row[5],
-                    estimated_cost=row[6],
-                    retry_count=row[7],
-                    request_id=row[8]
-                ))
-            return events
-        finally:
-            conn.close()
+        Returns:
+            List of row tuples ordered by timestamp (newest first)
+        """
+        conn = get_cached_connection(self.db_path)
+        query = """
+            SELECT timestamp, feature, model, prompt_tokens, 
+                   completion_tokens, total_tokens, estimated_cost, 
+                   retry_count, request_id 
+            FROM llm_usage_event
+        """
+        params = []
+        conditions = []
+        
+        if feature:
+            conditions.append("feature = ?")
+            params.append(feature)
+        if model:
+            conditions.append("model = ?")
+            params.append(model)
+        if days is not None:
+            cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+            conditions.append("timestamp >= ?")
+            params.append(cutoff)
+        
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        
+        query += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+        
+        return conn.execute(query, params).fetchall()
     
     def get_usage_stats(
         self,
@@ -107,39 +186,36 @@ class UsageRepository:
         Returns:
             Dictionary containing usage statistics
         """
-        conn = get_connection(self.db_path)
-        try:
-            cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-            
-            query = """
-                SELECT 
-                    COUNT(*) as total_requests,
-                    SUM(estimated_cost) as total_cost,
-                    AVG(estimated_cost) as avg_cost,
-                    SUM(total_tokens) as total_tokens
-                FROM llm_usage_event
-                WHERE timestamp >= ?
-            """
-            params = [cutoff]
-            
-            if feature:
-                query += " AND feature = ?"
-                params.append(feature)
-            if model:
-                query += " AND model = ?"
-                params.append(model)
-            
-            cursor = conn.execute(query, params)
-            row = cursor.fetchone()
-            
-            return {
-                "total_requests": row[0] or 0,
-                "total_cost": float(row[1] or 0),
-                "avg_cost": float(row[2] or 0),
-                "total_tokens": row[3] or 0
-            }
-        finally:
-            conn.close()
+        conn = get_cached_connection(self.db_path)
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        
+        query = """
+            SELECT 
+                COUNT(*) as total_requests,
+                SUM(estimated_cost) as total_cost,
+                AVG(estimated_cost) as avg_cost,
+                SUM(total_tokens) as total_tokens
+            FROM llm_usage_event
+            WHERE timestamp >= ?
+        """
+        params = [cutoff]
+        
+        if feature:
+            query += " AND feature = ?"
+            params.append(feature)
+        if model:
+            query += " AND model = ?"
+            params.append(model)
+        
+        cursor = conn.execute(query, params)
+        row = cursor.fetchone()
+        
+        return {
+            "total_requests": row[0] or 0,
+            "total_cost": float(row[1] or 0),
+            "avg_cost": float(row[2] or 0),
+            "total_tokens": row[3] or 0
+        }
 
 
 # Global repository instance
@@ -173,7 +249,7 @@ def initialize_schema(db_path: str = "ai_cost_guard.db") -> None:
     Args:
         db_path: Path to SQLite database file
     """
-    conn = get_connection(db_path)
+    conn = get_cached_connection(db_path)
     try:
         conn.execute("""
             CREATE TABLE IF NOT EXISTS llm_usage_event (
@@ -189,9 +265,24 @@ def initialize_schema(db_path: str = "ai_cost_guard.db") -> None:
                 request_id TEXT
             )
         """)
+        # WAL lets readers run alongside the writer and, together with
+        # synchronous=NORMAL, syncs once per checkpoint instead of per commit
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_usage_event_feature_model_ts
+            ON llm_usage_event (feature, model, timestamp DESC)
+        """)
+        # Time-ordered index for unfiltered reads; kept narrow so every
+        # append pays for as little index maintenance as possible
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_usage_event_ts
+            ON llm_usage_event (timestamp DESC)
+        """)
         conn.commit()
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 def insert_usage_event(event: LLMUsageEvent, db_path: str = "ai_cost_guard.db") -> None:
@@ -204,27 +295,13 @@ def insert_usage_event(event: LLMUsageEvent, db_path: str = "ai_cost_guard.db")
         event: The usage event to record
         db_path: Path to SQLite database file
     """
-    conn = get_connection(db_path)
+    conn = get_cached_connection(db_path)
     try:
-        conn.execute("""
-            INSERT INTO llm_usage_event 
-            (timestamp, feature, model, prompt_tokens, completion_tokens, 
-             total_tokens, estimated_cost, retry_count, request_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            event.timestamp.isoformat(),
-            event.feature,
-            event.model,
-            event.prompt_tokens,
-            event.completion_tokens,
-            event.total_tokens,
-            event.estimated_cost,
-            event.retry_count,
-            event.request_id
-        ))
+        conn.execute(_INSERT_EVENT_SQL, event_to_row(event))
         conn.commit()
-    finally:
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
 
 
 def insert_usage_events(events: List[LLMUsageEvent], db_path: str = "ai_cost_guard.db") -> None:
@@ -240,32 +317,15 @@ def insert_usage_events(events: List[LLMUsageEvent], db_path: str = "ai_cost_gua
     if not events:
         return
     
-    conn = get_connection(db_path)
+    conn = get_cached_connection(db_path)
     try:
         conn.execute("BEGIN TRANSACTION")
-        for event in events:
-            conn.execute("""
-                INSERT INTO llm_usage_event 
-                (timestamp, feature, model, prompt_tokens, completion_tokens, 
-                 total_tokens, estimated_cost, retry_count, request_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                event.timestamp.isoformat(),
-                event.feature,
-                event.model,
-                event.prompt_tokens,
-                event.completion_tokens,
-                event.total_tokens,
-                event.estimated_cost,
-                event.retry_count,
-                event.request_id
-            ))
+        # Rows are produced lazily; executemany consumes the iterator directly
+        conn.executemany(_INSERT_EVENT_SQL, map(event_to_row, events))
         conn.commit()
     except Exception:
         conn.rollback()
         raise
-    finally:
-        conn.close()
 
 
 def fetch_recent_usage_events(
@@ -288,38 +348,22 @@ def fetch_recent_usage_events(
     Returns:
         List of usage events ordered by timestamp (newest first)
     """
-    conn = get_connection(db_path)
-    try:
-        query = "SELECT timestamp, feature, model, prompt_tokens, completion_tokens, total_tokens, estimated_cost, retry_count, request_id FROM llm_usage_event"
-        params = []
-        
-        if feature or model:
-            conditions = []
-            if feature:
-                conditions.append("feature = ?")
-                params.append(feature)
-            if model:
-                conditions.append("model = ?")
-                params.append(model)
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY timestamp DESC LIMIT ?"
-        params.append(limit)
-        
-        cursor = conn.execute(query, params)
-        events = []
-        for row in cursor.fetchall():
-            events.append(LLMUsageEvent(
-                timestamp=datetime.fromisoformat(row[0]),
-                feature=row[1],
-                model=row[2],
-                prompt_tokens=row[3],
-                completion_tokens=row[4],
-                total_tokens=row[5],
-                estimated_cost=row[6],
-                retry_count=row[7],
-                request_id=row[8]
-            ))
-        return events
-    finally:
-        conn.close()
\ No newline at end of file
+    conn = get_cached_connection(db_path)
+    query = "SELECT timestamp, feature, model, prompt_tokens, completion_tokens, total_tokens, estimated_cost, retry_count, request_id FROM llm_usage_event"
+    params = []
+    
+    if feature or model:
+        conditions = []
+        if feature:
+            conditions.append("feature = ?")
+            params.append(feature)
+        if model:
+            conditions.append("model = ?")
+            params.append(model)
+        query += " WHERE " + " AND ".join(conditions)
+    
+    query += " ORDER BY timestamp DESC LIMIT ?"
+    params.append(limit)
+    
+    cursor = conn.execute(query, params)
+    return rows_to_events(cursor)
\ No newline at end of file
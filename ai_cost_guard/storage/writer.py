@@ -0,0 +1,117 @@
+"""
+Buffered writer for usage events.
+
+Groups usage events into batches so that many recorded calls share a
+single transaction instead of committing one row at a time.
+"""
+
+import threading
+import time
+import weakref
+from typing import List
+
+from .models import LLMUsageEvent
+from .repository import insert_usage_events
+
+
+def _flush_buffer(db_path: str, buffer: List[LLMUsageEvent]) -> None:
+    """Write out a writer's buffer after the writer itself is gone.
+
+    Takes the buffer rather than the writer so that a pending finalizer
+    does not keep the writer alive.
+    """
+    if buffer:
+        events = buffer[:]
+        del buffer[:]
+        insert_usage_events(events, db_path)
+
+
+class UsageWriter:
+    """Buffers usage events and writes them to the ledger in batches.
+
+    The buffer is flushed when it reaches batch_size events, when a write
+    arrives at least flush_interval seconds after the previous flush, on
+    close(), and when an unclosed writer is garbage-collected or the
+    interpreter exits. Flushes are serialised, so batches reach the ledger
+    in the order their events were written. A failed flush puts the events
+    back in the buffer and re-raises, so no event is silently dropped.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "ai_cost_guard.db",
+        batch_size: int = 100,
+        flush_interval: float = 1.0
+    ):
+        """Initialize the writer.
+
+        Args:
+            db_path: Path to SQLite database file
+            batch_size: Number of buffered events that triggers a flush
+            flush_interval: Maximum seconds between flushes while writing
+
+        Raises:
+            ValueError: If batch_size or flush_interval is invalid
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if flush_interval < 0:
+            raise ValueError("flush_interval cannot be negative")
+
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[LLMUsageEvent] = []
+        self._lock = threading.Lock()
+        # Held across the insert so concurrent flushes commit in order
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Flushes the buffer when the writer is collected or at exit; the
+        # buffer list is only ever mutated in place so this stays valid
+        self._finalizer = weakref.finalize(
+            self, _flush_buffer, db_path, self._buffer
+        )
+
+    def write(self, event: LLMUsageEvent) -> None:
+        """Add an event to the buffer, flushing if a threshold is reached.
+
+        Args:
+            event: The usage event to record
+        """
+        with self._lock:
+            self._buffer.append(event)
+            due = (
+                len(self._buffer) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered events in a single transaction."""
+        with self._flush_lock:
+            with self._lock:
+                events = self._buffer[:]
+                del self._buffer[:]
+                self._last_flush = time.monotonic()
+            if not events:
+                return
+
+            try:
+                insert_usage_events(events, self.db_path)
+            except Exception:
+                # Keep the events (ahead of any written meanwhile) and stay loud
+                with self._lock:
+                    self._buffer[:0] = events
+                raise
+
+    def close(self) -> None:
+        """Flush remaining events and stop flushing at interpreter exit."""
+        self.flush()
+        self._finalizer.detach()
+
+    def __enter__(self) -> "UsageWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
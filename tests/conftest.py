@@ -0,0 +1,81 @@
+"""
+Shared pytest fixtures.
+
+Session-scoped fixtures return immutable data only (frozen dataclasses,
+tuples), so sharing them between tests is safe and the suite can run in
+parallel workers (e.g. pytest-xdist), each building its own copy.
+"""
+import itertools
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from ai_cost_guard.storage import db
+from ai_cost_guard.storage.repository import initialize_schema
+
+# Unique names keep each test's in-memory database private
+_memory_db_ids = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def fixed_now():
+    """A single fixed instant that tests can use as "now"."""
+    return datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def frozen_now(monkeypatch, fixed_now):
+    """Freeze datetime.now() in the baseline module to fixed_now.
+    
+    Not autouse: tests that stamp their events with the real datetime.now()
+    would fall outside a window anchored at fixed_now.
+    """
+    class _FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return fixed_now
+    
+    monkeypatch.setattr("ai_cost_guard.core.baseline.datetime", _FrozenDatetime)
+    return fixed_now
+
+
+@pytest.fixture(scope="session")
+def schema_template(tmp_path_factory):
+    """An empty database with the schema, created once per session."""
+    path = str(tmp_path_factory.mktemp("template") / "template.db")
+    initialize_schema(path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def memory_db(schema_template):
+    """Return a factory for in-memory copies of the schema template.
+    
+    Each copy is a shared-cache in-memory database opened by URI here, in
+    the tests, and placed in the current thread's connection cache under
+    its URI, so repository calls given that path reuse it without any disk
+    I/O. It lives until close_cached_connection(path) closes it.
+    """
+    def make(name: str) -> str:
+        path = f"file:{name}?mode=memory&cache=shared"
+        conn = sqlite3.connect(path, uri=True)
+        conn.execute("PRAGMA foreign_keys = ON")
+        template = sqlite3.connect(schema_template)
+        try:
+            template.backup(conn)
+        finally:
+            template.close()
+        if getattr(db._thread_local, "connections", None) is None:
+            db._thread_local.connections = {}
+        db._thread_local.connections[path] = conn
+        return path
+    return make
+
+
+@pytest.fixture
+def db_path(memory_db):
+    """A private in-memory copy of the schema template for a single test."""
+    path = memory_db(f"test-{next(_memory_db_ids)}")
+    yield path
+    db.close_cached_connection(path)
@@ -4,7 +4,9 @@ Unit tests for anomaly detection.
 Tests conservative anomaly detection rules and validation.
 """
 
-from datetime import datetime, timedelta
+from dataclasses import replace
+from datetime import timedelta
+from functools import lru_cache
 
 import pytest
 
@@ -21,281 +23,245 @@ from ai_cost_guard.core.baseline import (
 from ai_cost_guard.storage.models import LLMUsageEvent
 
 
-class TestAnomalyDetection:
-    """Test anomaly detection rules and validation."""
+# Expected rule sets, shared by every parametrized case
+RULES_AB = frozenset({"A", "B"})
+RULES_ABC = frozenset({"A", "B", "C"})
+
+
+@pytest.fixture(scope="class")
+def baseline_factory(fixed_now):
+    """Build baselines for testing, sharing one time window per class.
     
-    def create_baseline(self, p90_cost: float = 10.0, median_tokens: int = 1000, state: BaselineState = BaselineState.WARM) -> BaselineResult:
-        """Create a baseline result for testing.
-        
-        Args:
-            p90_cost: P90 cost for the baseline (default: 10.0)
-            median_tokens: Median tokens for the baseline (default: 1000)
-            state: Baseline state (default: WARM)
-        """
+    Baselines are immutable, so each distinct shape is built once and the
+    cached instance is reused by every test that asks for it.
+    """
+    window_end = fixed_now
+    window_start = window_end - timedelta(days=1)
+    
+    @lru_cache(maxsize=None)
+    def build(
+        p90_cost: float = 10.0,
+        median_tokens: int = 1000,
+        state: BaselineState = BaselineState.WARM
+    ) -> BaselineResult:
         metrics = BaselineMetrics(
             median_cost=8.0,  # Provide a default median_cost that's less than p90_cost
             p90_cost=p90_cost,
             median_tokens=median_tokens,
             sample_count=100
         )
-        
         return BaselineResult(
             metrics=metrics,
             state=state,
-            window_start=datetime.now() - timedelta(days=1),
-            window_end=datetime.now()
+            window_start=window_start,
+            window_end=window_end
         )
     
-    def create_current_event(self, cost: float = 10.0, tokens: int = 1000, retries: int = 0) -> LLMUsageEvent:
-        """Create a current usage event for testing."""
-        return LLMUsageEvent(
-            timestamp=datetime.now(),
-            feature="test_feature",
-            model="test_model",
-            prompt_tokens=tokens // 2,
-            completion_tokens=tokens // 2,
+    return build
+
+
+@pytest.fixture(scope="class")
+def default_baseline(baseline_factory):
+    """The WARM baseline with P90 cost 10.0 and median tokens 1000."""
+    return baseline_factory(p90_cost=10.0, median_tokens=1000)
+
+
+@pytest.fixture(scope="class")
+def event_factory(fixed_now):
+    """Build current usage events for testing, cached per shape like baselines.
+    
+    Events are derived from one template, so only the varied fields are
+    spelled out.
+    """
+    template = LLMUsageEvent(
+        timestamp=fixed_now,
+        feature="test_feature",
+        model="test_model",
+        prompt_tokens=500,
+        completion_tokens=500,
+        total_tokens=1000,
+        estimated_cost=10.0,
+        retry_count=0
+    )
+    
+    @lru_cache(maxsize=None)
+    def build(cost: float = 10.0, tokens: int = 1000, retries: int = 0) -> LLMUsageEvent:
+        half = tokens // 2
+        return replace(
+            template,
+            prompt_tokens=half,
+            completion_tokens=tokens - half,
             total_tokens=tokens,
             estimated_cost=cost,
             retry_count=retries
         )
     
-    def test_no_anomalies_for_normal_behavior(self):
+    return build
+
+
+class TestAnomalyDetection:
+    """Test anomaly detection rules and validation."""
+    
+    def test_no_anomalies_for_normal_behavior(self, baseline_factory, event_factory):
         """Test that normal behavior produces no anomalies."""
-        baseline = self.create_baseline(
+        baseline = baseline_factory(
             p90_cost=15.0,
             median_tokens=1000
         )
         
         # Below all thresholds
-        current_event = self.create_current_event(cost=10.0, tokens=1000, retries=1)
+        current_event = event_factory(cost=10.0, tokens=1000, retries=1)
         
         anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
         
         assert len(anomalies) == 0
     
-    def test_rule_a_cost_spike(self):
-        """Test Rule A (CRITICAL) triggers when cost > 1.5 * P90."""
-        baseline = self.create_baseline(p90_cost=10.0)
-        
-        # Cost above 1.5 * P90 (15.0) should trigger Rule A
-        current_event = self.create_current_event(cost=16.0)  # 16 > 15 (10 * 1.5)
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_a = [a for a in anomalies if a.rule == "A"]
-        
-        assert len(rule_a) == 1, "Should have exactly one Rule A anomaly"
-        assert rule_a[0].severity == AnomalySeverity.CRITICAL
-        assert rule_a[0].observed_value == 16.0
-        assert rule_a[0].baseline_value == 10.0
-        assert rule_a[0].threshold == 15.0
-        assert "Cost spike" in rule_a[0].message
-    
-    def test_rule_a_no_trigger_below_threshold(self):
-        """Test Rule A does not trigger at or below 1.5 * P90."""
-        baseline = self.create_baseline(p90_cost=10.0)
-        
-        # Cost exactly at 1.5 * P90 should not trigger Rule A
-        current_event = self.create_current_event(cost=15.0)  # 15 == 10 * 1.5
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_a = [a for a in anomalies if a.rule == "A"]
-        
-        assert len(rule_a) == 0, "Rule A should not trigger at 1.5 * P90"
-    
-    def test_rule_b_token_explosion(self):
-        """Test Rule B (WARNING) triggers when tokens > 1.7 * median."""
-        baseline = self.create_baseline(median_tokens=1000)
-        
-        # Tokens above 1.7 * median (1700) should trigger Rule B
-        current_event = self.create_current_event(tokens=1800)  # 1800 > 1700 (1000 * 1.7)
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_b = [a for a in anomalies if a.rule == "B"]
-        
-        assert len(rule_b) == 1, "Should have exactly one Rule B anomaly"
-        assert rule_b[0].severity == AnomalySeverity.WARNING
-        assert rule_b[0].observed_value == 1800
-        assert rule_b[0].baseline_value == 1000
-        assert rule_b[0].threshold == 1700
-        assert "token usage" in rule_b[0].message.lower()
-    
-    def test_rule_b_no_trigger_below_threshold(self):
-        """Test Rule B does not trigger at or below 1.7 * median tokens."""
-        baseline = self.create_baseline(median_tokens=1000)
-        
-        # Tokens exactly at 1.7 * median should not trigger Rule B
-        current_event = self.create_current_event(tokens=1700)  # 1700 == 1000 * 1.7
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_b = [a for a in anomalies if a.rule == "B"]
-        
-        assert len(rule_b) == 0, "Rule B should not trigger at 1.7 * median tokens"
-    
-    def test_rule_c_retry_amplification(self):
-        """Test Rule C (WARNING) triggers for retry amplification."""
-        baseline = self.create_baseline(p90_cost=10.0)
-        
-        # 2 retries * 8.0 = 16.0 > 13.0 (10 * 1.3) should trigger Rule C
-        current_event = self.create_current_event(cost=8.0, retries=2)
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_c = [a for a in anomalies if a.rule == "C"]
-        
-        assert len(rule_c) == 1, "Should have exactly one Rule C anomaly"
-        assert rule_c[0].severity == AnomalySeverity.WARNING
-        assert rule_c[0].observed_value == 16.0  # 8 * 2 retries
-        assert rule_c[0].baseline_value == 10.0
-        assert rule_c[0].threshold == 13.0  # 10 * 1.3
-        assert "retry" in rule_c[0].message.lower()
-    
-    def test_rule_c_no_retry_no_trigger(self):
-        """Test Rule C does not trigger without retries."""
-        baseline = self.create_baseline(p90_cost=10.0)
-        
-        # No retries, so Rule C should not trigger even if cost is high
-        current_event = self.create_current_event(cost=20.0, retries=1)
+    @pytest.mark.parametrize(
+        "rule,p90_cost,median_tokens,cost,tokens,retries,expected",
+        [
+            # expected: (severity, observed, baseline, threshold, message text)
+            pytest.param(
+                "A", 10.0, 1000, 16.0, 1000, 0,
+                (AnomalySeverity.CRITICAL, 16.0, 10.0, 15.0, "cost spike"),
+                id="rule-a-above-1.5x-p90"
+            ),
+            pytest.param(
+                "A", 10.0, 1000, 15.0, 1000, 0, None,
+                id="rule-a-at-1.5x-p90"
+            ),
+            pytest.param(
+                "B", 10.0, 1000, 10.0, 1800, 0,
+                (AnomalySeverity.WARNING, 1800, 1000, 1700, "token usage"),
+                id="rule-b-above-1.7x-median"
+            ),
+            pytest.param(
+                "B", 10.0, 1000, 10.0, 1700, 0, None,
+                id="rule-b-at-1.7x-median"
+            ),
+            pytest.param(
+                "C", 10.0, 1000, 8.0, 1000, 2,
+                (AnomalySeverity.WARNING, 16.0, 10.0, 13.0, "retry"),
+                id="rule-c-two-retries"
+            ),
+            pytest.param(
+                "C", 10.0, 1000, 5.0, 1000, 3,
+                (AnomalySeverity.WARNING, 15.0, 10.0, 13.0, "retry"),
+                id="rule-c-high-retry-count"
+            ),
+            pytest.param(
+                "C", 10.0, 1000, 20.0, 1000, 1, None,
+                id="rule-c-single-attempt"
+            ),
+        ]
+    )
+    def test_rule_threshold(
+        self, baseline_factory, event_factory,
+        rule, p90_cost, median_tokens, cost, tokens, retries, expected
+    ):
+        """Test each rule triggers strictly above its threshold."""
+        baseline = baseline_factory(p90_cost=p90_cost, median_tokens=median_tokens)
+        current_event = event_factory(cost=cost, tokens=tokens, retries=retries)
         
         anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_c = [a for a in anomalies if a.rule == "C"]
-        
-        assert len(rule_c) == 0, "Rule C should not trigger without retries > 1"
+        matching = [a for a in anomalies if a.rule == rule]
+        
+        if expected is None:
+            assert matching == []
+            return
+        
+        severity, observed, baseline_value, threshold, text = expected
+        assert len(matching) == 1, f"Should have exactly one Rule {rule} anomaly"
+        anomaly = matching[0]
+        assert anomaly.severity == severity
+        assert anomaly.observed_value == observed
+        assert anomaly.baseline_value == baseline_value
+        assert anomaly.threshold == threshold
+        assert text in anomaly.message.lower()
     
-    def test_multiple_rules_can_trigger_independently(self):
-        """Test that multiple rules can trigger for the same event."""
-        baseline = self.create_baseline(
-            p90_cost=10.0,
-            median_tokens=1000
-        )
-        
-        # This should trigger:
-        # - Rule A: 16.0 > 15.0 (10 * 1.5)
-        # - Rule B: 2000 > 1700 (1000 * 1.7)
-        current_event = self.create_current_event(cost=16.0, tokens=2000, retries=1)
+    @pytest.mark.parametrize(
+        "retries,expected_rules",
+        [
+            # Rule A: 16.0 > 15.0 (10 * 1.5); Rule B: 2000 > 1700 (1000 * 1.7)
+            pytest.param(1, RULES_AB, id="rules-a-b"),
+            # Plus Rule C: 2 retries * 16.0 = 32.0 > 13.0 (10 * 1.3)
+            pytest.param(2, RULES_ABC, id="rules-a-b-c"),
+        ]
+    )
+    def test_combined_rules_trigger_independently(
+        self, default_baseline, event_factory, retries, expected_rules
+    ):
+        """Test that several rules can trigger for the same event."""
+        baseline = default_baseline
+        current_event = event_factory(cost=16.0, tokens=2000, retries=retries)
         
         anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
         
-        # Should trigger both Rule A and B
-        rules = {a.rule for a in anomalies}
-        assert rules == {"A", "B"}, "Should trigger both Rule A and B"
+        assert frozenset(a.rule for a in anomalies) == expected_rules
         
-        # Verify both anomalies have correct details
+        # Verify each anomaly's details and severity
+        expected_severities = {
+            "A": AnomalySeverity.CRITICAL,
+            "B": AnomalySeverity.WARNING,
+            "C": AnomalySeverity.WARNING,
+        }
         for anomaly in anomalies:
             assert anomaly.feature == "test_feature"
             assert anomaly.model == "test_model"
+            assert anomaly.severity == expected_severities[anomaly.rule]
     
-    def test_all_three_rules_can_trigger(self):
-        """Test that all three rules can trigger simultaneously."""
-        baseline = self.create_baseline(
-            p90_cost=10.0,
-            median_tokens=1000
-        )
-        
-        # This should trigger:
-        # - Rule A: 16.0 > 15.0 (10 * 1.5)
-        # - Rule B: 2000 > 1700 (1000 * 1.7)
-        # - Rule C: 2 retries * 8.0 = 16.0 > 13.0 (10 * 1.3)
-        current_event = self.create_current_event(cost=16.0, tokens=2000, retries=2)
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        
-        # Should trigger all three rules
-        rules = {a.rule for a in anomalies}
-        assert len(rules) == 3, f"Expected 3 rules to trigger, got {rules}"
-        assert "A" in rules
-        assert "B" in rules
-        assert "C" in rules
-        
-        # Verify severities
-        rule_severities = {a.rule: a.severity for a in anomalies}
-        assert rule_severities["A"] == AnomalySeverity.CRITICAL
-        assert rule_severities["B"] == AnomalySeverity.WARNING
-        assert rule_severities["C"] == AnomalySeverity.WARNING
-    
-    def test_cold_baseline_produces_no_anomalies(self):
+    def test_cold_baseline_produces_no_anomalies(self, baseline_factory, event_factory):
         """Test that cold baseline produces no anomalies."""
-        baseline = self.create_baseline(
+        baseline = baseline_factory(
             p90_cost=15.0,
             median_tokens=1000,
             state=BaselineState.COLD
         )
         
         # Even with high cost and retries, cold baseline should produce no anomalies
-        current_event = self.create_current_event(cost=100.0, tokens=2000, retries=3)
+        current_event = event_factory(cost=100.0, tokens=2000, retries=3)
         
         anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
         
         assert len(anomalies) == 0, "Cold baseline should not produce any anomalies"
     
-    def test_missing_baseline_metrics_raises_error(self):
+    def test_missing_baseline_metrics_raises_error(self, event_factory, fixed_now):
         """Test that missing baseline metrics raises error."""
         baseline = BaselineResult(
             metrics=None,  # Missing metrics
             state=BaselineState.WARM,
-            window_start=datetime.now() - timedelta(days=1),
-            window_end=datetime.now()
+            window_start=fixed_now - timedelta(days=1),
+            window_end=fixed_now
         )
         
-        current_event = self.create_current_event(cost=10.0, tokens=1000)
+        current_event = event_factory(cost=10.0, tokens=1000)
         
         with pytest.raises(AttributeError):
             detect_anomalies("test_feature", "test_model", baseline, current_event)
     
-    def test_missing_current_event_cost_raises_error(self):
-        """Test that missing current event cost raises error."""
-        baseline = self.create_baseline(p90_cost=15.0, median_tokens=1000)
-        
-        # Create event without cost
-        current_event = LLMUsageEvent(
-            timestamp=datetime.now(),
+    @pytest.mark.parametrize(
+        "missing_field,match",
+        [
+            pytest.param("estimated_cost", "estimated_cost is required", id="cost"),
+            pytest.param("total_tokens", "total_tokens is required", id="tokens"),
+            pytest.param("retry_count", "retry_count is required", id="retry-count"),
+        ]
+    )
+    def test_missing_event_field_raises_error(self, fixed_now, missing_field, match):
+        """Test that an event without a required field is rejected at construction."""
+        fields = dict(
+            timestamp=fixed_now,
             feature="test_feature",
             model="test_model",
             prompt_tokens=500,
             completion_tokens=500,
             total_tokens=1000,
-            estimated_cost=None,  # Missing cost
-            retry_count=1
-        )
-        
-        with pytest.raises(ValueError, match="Current event missing estimated_cost"):
-            detect_anomalies("test_feature", "test_model", baseline, current_event)
-    
-    def test_missing_current_event_tokens_raises_error(self):
-        """Test that missing current event tokens raises error."""
-        baseline = self.create_baseline(p90_cost=15.0, median_tokens=1000)
-        
-        # Create event without tokens
-        current_event = LLMUsageEvent(
-            timestamp=datetime.now(),
-            feature="test_feature",
-            model="test_model",
-            prompt_tokens=0,
-            completion_tokens=0,
-            total_tokens=None,  # Missing tokens
             estimated_cost=10.0,
             retry_count=1
         )
+        fields[missing_field] = None
         
-        with pytest.raises(ValueError, match="Current event missing total_tokens"):
-            detect_anomalies("test_feature", "test_model", baseline, current_event)
-    
-    def test_missing_retry_count_raises_error(self):
-        """Test that missing retry_count raises error."""
-        baseline = self.create_baseline(p90_cost=15.0, median_tokens=1000)
-        
-        # Create event without retry_count
-        current_event = LLMUsageEvent(
-            timestamp=datetime.now(),
-            feature="test_feature",
-            model="test_model",
-            prompt_tokens=500,
-            completion_tokens=500,
-            total_tokens=1000,
-            estimated_cost=10.0,
-            retry_count=None  # Missing retry_count
-        )
-        
-        with pytest.raises(ValueError, match="Current event missing retry_count"):
-            detect_anomalies("test_feature", "test_model", baseline, current_event)
+        with pytest.raises(ValueError, match=match):
+            LLMUsageEvent(**fields)
     
     def test_anomaly_event_dataclass_immutability(self):
         """Test that AnomalyEvent is immutable."""
@@ -314,33 +280,21 @@ class TestAnomalyDetection:
         with pytest.raises(Exception):
             event.rule = "B"
     
-    def test_anomaly_messages_are_human_readable(self):
+    def test_anomaly_messages_are_human_readable(self, default_baseline, event_factory):
         """Test that anomaly messages are human-readable and accurate."""
-        baseline = self.create_baseline(p90_cost=10.0, median_tokens=1000)
+        baseline = default_baseline
         
-        # Test Rule A message
-        current_event = self.create_current_event(cost=16.0)  # 16 > 15 (10 * 1.5)
+        # 16 > 15 (10 * 1.5) trips Rule A; 1800 > 1700 (1000 * 1.7) trips Rule B
+        current_event = event_factory(cost=16.0, tokens=1800)
         anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_a = next((a for a in anomalies if a.rule == "A"), None)
-        assert rule_a is not None
-        assert "Cost spike" in rule_a.message
-        assert "16.00" in rule_a.message  # Check cost is formatted with 2 decimal places
-        assert "10.00" in rule_a.message  # Check baseline is included
+        by_rule = {a.rule: a for a in anomalies}
         
-        # Test Rule B message
-        current_event = self.create_current_event(tokens=1800)  # 1800 > 1700 (1000 * 1.7)
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_b = next((a for a in anomalies if a.rule == "B"), None)
-        
-    def test_rule_c_with_high_retry_count(self):
-        """Test Rule C triggers with high retry count."""
-        baseline = self.create_baseline(p90_cost=10.0)
-        
-        # High retry count should trigger Rule C
-        current_event = self.create_current_event(cost=5.0, retries=3)  # 5 * 3 = 15 > 13 (10 * 1.3)
-        
-        anomalies = detect_anomalies("test_feature", "test_model", baseline, current_event)
-        rule_c = [a for a in anomalies if a.rule == "C"]
+        # Rule A message
+        assert "Cost spike" in by_rule["A"].message
+        assert "16.00" in by_rule["A"].message  # Check cost is formatted with 2 decimal places
+        assert "10.00" in by_rule["A"].message  # Check baseline is included
         
-        assert len(rule_c) == 1, "Rule C should trigger with high retry count"
-        assert rule_c[0].observed_value == 15.0  # 5 * 3 retries
+        # Rule B message
+        assert "token usage" in by_rule["B"].message.lower()
+        assert "1,800" in by_rule["B"].message  # Check tokens use thousands separators
+        assert "1,000" in by_rule["B"].message  # Check median is included
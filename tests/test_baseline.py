@@ -4,7 +4,12 @@ Unit tests for baseline computation.
 Tests deterministic baseline calculation from usage events.
 """
 
+import math
+import random
+import statistics
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Tuple
 
 import pytest
 
@@ -18,59 +23,92 @@ from ai_cost_guard.core.baseline import (
 from ai_cost_guard.storage.models import LLMUsageEvent
 
 
+@lru_cache(maxsize=None)
+def _hourly_ramp_events(n: int, now: datetime) -> Tuple[LLMUsageEvent, ...]:
+    """Build n hourly events with increasing cost and tokens, once per (n, now)."""
+    return tuple(
+        LLMUsageEvent(
+            timestamp=now - timedelta(hours=i),
+            feature="test_feature",
+            model="test_model",
+            prompt_tokens=(i + 1) * 5,
+            completion_tokens=(i + 1) * 5,
+            total_tokens=(i + 1) * 10,
+            estimated_cost=float(i) + 1.0
+        )
+        for i in range(n)
+    )
+
+
+@pytest.fixture(scope="session")
+def big_event_list(fixed_now):
+    """250 events one minute apart (newest first), built once per session."""
+    return tuple(
+        LLMUsageEvent(
+            timestamp=fixed_now - timedelta(minutes=i),
+            feature="test_feature",
+            model="test_model",
+            prompt_tokens=(i + 1) * 5,
+            completion_tokens=(i + 1) * 5,
+            total_tokens=(i + 1) * 10,
+            estimated_cost=float(i) + 1.0
+        )
+        for i in range(250)  # 250 events > 200 limit
+    )
+
+
 class TestExactPercentile:
     """Test exact percentile computation."""
     
-    def test_median_even_count(self):
-        """Test median computation with even number of values."""
-        values = [1.0, 2.0, 3.0, 4.0]
-        median = _compute_exact_percentile(values, 50)
-        assert median == 2.5  # (2.0 + 3.0) / 2
-    
-    def test_median_odd_count(self):
-        """Test median computation with odd number of values."""
-        values = [1.0, 2.0, 3.0]
-        median = _compute_exact_percentile(values, 50)
-        assert median == 2.0
-    
-    def test_p90_exact(self):
-        """Test P90 computation with exact position."""
-        values = [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
-        p90 = _compute_exact_percentile(values, 90)
-        assert p90 == 9.1  # Position 8.1: 9.0 + 0.1 * (10.0 - 9.0)
-    
-    def test_p90_interpolation(self):
-        """Test P90 computation with interpolation."""
-        values = [10.0, 20.0, 30.0, 40.0]
-        p90 = _compute_exact_percentile(values, 90)
-        assert p90 == 37.0  # Position 2.7: 30.0 + 0.7 * (40.0 - 30.0)
-    
-    def test_percentile_zero(self):
-        """Test 0th percentile (minimum)."""
-        values = [5.0, 10.0, 15.0]
-        result = _compute_exact_percentile(values, 0)
-        assert result == 5.0
-    
-    def test_percentile_hundred(self):
-        """Test 100th percentile (maximum)."""
-        values = [5.0, 10.0, 15.0]
-        result = _compute_exact_percentile(values, 100)
-        assert result == 15.0
-    
-    def test_empty_values_raises_error(self):
-        """Test that empty values list raises error."""
-        with pytest.raises(ValueError, match="Values list cannot be empty"):
-            _compute_exact_percentile([], 50)
+    @pytest.mark.parametrize(
+        "values,percentile,expected",
+        [
+            pytest.param([1.0, 2.0, 3.0, 4.0], 50, 2.5, id="median-even"),  # (2.0 + 3.0) / 2
+            pytest.param([1.0, 2.0, 3.0], 50, 2.0, id="median-odd"),
+            # Position 8.1: 9.0 + 0.1 * (10.0 - 9.0)
+            pytest.param([float(v) for v in range(1, 11)], 90, 9.1, id="p90-exact"),
+            # Position 2.7: 30.0 + 0.7 * (40.0 - 30.0)
+            pytest.param([10.0, 20.0, 30.0, 40.0], 90, 37.0, id="p90-interpolation"),
+            pytest.param([5.0, 10.0, 15.0], 0, 5.0, id="p0-minimum"),
+            pytest.param([5.0, 10.0, 15.0], 100, 15.0, id="p100-maximum"),
+        ]
+    )
+    def test_percentile(self, values, percentile, expected):
+        """Test exact percentile values against hand-computed results."""
+        assert _compute_exact_percentile(values, percentile) == pytest.approx(expected)
     
-    def test_invalid_percentile_raises_error(self):
-        """Test that invalid percentile raises error."""
-        values = [1.0, 2.0, 3.0]
+    def test_percentile_matches_reference_interpolation(self):
+        """Test against statistics.quantiles on seeded random samples.
         
-        with pytest.raises(ValueError, match="Percentile must be between 0 and 100"):
-            _compute_exact_percentile(values, -1)
-        
-        with pytest.raises(ValueError, match="Percentile must be between 0 and 100"):
-            _compute_exact_percentile(values, 101)
+        The 'inclusive' method is the same linear interpolation as
+        numpy.percentile's default, so it serves as an independent reference.
+        """
+        rng = random.Random(20240101)
+        for _ in range(200):
+            values = [
+                rng.uniform(0, 1e6) for _ in range(rng.randint(2, 100))
+            ]
+            cut_points = statistics.quantiles(values, n=100, method="inclusive")
+            expected = [min(values)] + cut_points + [max(values)]
+            for percentile in (0, 1, 25, 50, 73, 90, 99, 100):
+                assert math.isclose(
+                    _compute_exact_percentile(values, percentile),
+                    expected[percentile],
+                    rel_tol=1e-9
+                ), (values, percentile)
+    
+    @pytest.mark.parametrize(
+        "values,percentile,match",
+        [
+            pytest.param([], 50, "Values list cannot be empty", id="empty-values"),
+            pytest.param([1.0, 2.0, 3.0], -1, "Percentile must be between 0 and 100", id="below-0"),
+            pytest.param([1.0, 2.0, 3.0], 101, "Percentile must be between 0 and 100", id="above-100"),
+        ]
+    )
+    def test_percentile_errors(self, values, percentile, match):
+        """Test that invalid inputs raise errors."""
+        with pytest.raises(ValueError, match=match):
+            _compute_exact_percentile(values, percentile)
 
 
 class TestBaselineComputation:
@@ -78,55 +116,40 @@ class TestBaselineComputation:
     
     def create_test_event(self, cost: float, tokens: int, timestamp: datetime) -> LLMUsageEvent:
         """Create a test usage event."""
+        half = tokens // 2
         return LLMUsageEvent(
             timestamp=timestamp,
             feature="test_feature",
             model="test_model",
-            prompt_tokens=tokens // 2,
-            completion_tokens=tokens // 2,
+            prompt_tokens=half,
+            completion_tokens=tokens - half,
             total_tokens=tokens,
             estimated_cost=cost
         )
     
-    def test_cold_baseline_less_than_20_events(self):
-        """Test cold baseline with less than 20 events."""
-        now = datetime.now()
-        events = [
-            self.create_test_event(
-                cost=float(i) + 1.0,
-                tokens=(i + 1) * 10,
-                timestamp=now - timedelta(hours=i)
-            )
-            for i in range(10)  # 10 events < 20 threshold
+    @pytest.mark.parametrize(
+        "n,state,median_cost,p90_cost,median_tokens",
+        [
+            pytest.param(10, BaselineState.COLD, 5.5, 9.1, 55, id="10-events-cold"),
+            pytest.param(19, BaselineState.COLD, 10.0, 17.2, 100, id="19-events-cold"),
+            pytest.param(20, BaselineState.WARM, 10.5, 18.1, 105, id="20-events-warm"),
+            pytest.param(25, BaselineState.WARM, 13.0, 22.6, 130, id="25-events-warm"),
         ]
+    )
+    def test_baseline_state_threshold(
+        self, frozen_now, n, state, median_cost, p90_cost, median_tokens
+    ):
+        """Test baselines are COLD below 20 events and WARM from 20 on.
         
-        result = compute_baseline(events)
+        Event i costs i + 1 and uses (i + 1) * 10 tokens.
+        """
+        result = compute_baseline(list(_hourly_ramp_events(n, frozen_now)))
         
-        assert result.state == BaselineState.COLD
-        assert result.metrics.sample_count == 10
-        assert result.metrics.median_cost == 5.5  # Median of 1.0 to 10.0
-        assert result.metrics.p90_cost == 9.1  # P90 of 1.0 to 10.0
-        assert result.metrics.median_tokens == 55  # Median of 10, 20, ..., 100
-    
-    def test_warm_baseline_20_or_more_events(self):
-        """Test warm baseline with 20 or more events."""
-        now = datetime.now()
-        events = [
-            self.create_test_event(
-                cost=float(i) + 1.0,
-                tokens=(i + 1) * 10,
-                timestamp=now - timedelta(hours=i)
-            )
-            for i in range(25)  # 25 events >= 20 threshold
-        ]
-        
-        result = compute_baseline(events)
-        
-        assert result.state == BaselineState.WARM
-        assert result.metrics.sample_count == 25
-        assert result.metrics.median_cost == 13.0  # Median of 1.0 to 25.0
-        assert result.metrics.p90_cost == 22.6  # P90 of 1.0 to 25.0
-        assert result.metrics.median_tokens == 130  # Median of 10, 20, ..., 250
+        assert result.state == state
+        assert result.metrics.sample_count == n
+        assert result.metrics.median_cost == pytest.approx(median_cost)
+        assert result.metrics.p90_cost == pytest.approx(p90_cost)
+        assert result.metrics.median_tokens == median_tokens
     
     def test_empty_events_raises_error(self):
         """Test that empty events list raises error."""
@@ -134,24 +157,22 @@ class TestBaselineComputation:
             compute_baseline([])
     
     def test_missing_cost_raises_error(self):
-        """Test that events missing estimated_cost raise error."""
+        """Test that events missing estimated_cost are rejected."""
         # Create event without cost
-        event = LLMUsageEvent(
-            timestamp=datetime.now(),
-            feature="test_feature",
-            model="test_model",
-            prompt_tokens=50,
-            completion_tokens=50,
-            total_tokens=100,
-            estimated_cost=None  # Missing cost
-        )
-        
-        with pytest.raises(ValueError, match="Event at index 0 missing estimated_cost"):
-            compute_baseline([event])
+        with pytest.raises(ValueError, match="estimated_cost is required"):
+            LLMUsageEvent(
+                timestamp=datetime.now(),
+                feature="test_feature",
+                model="test_model",
+                prompt_tokens=50,
+                completion_tokens=50,
+                total_tokens=100,
+                estimated_cost=None  # Missing cost
+            )
     
-    def test_time_window_enforcement_7_days(self):
+    def test_time_window_enforcement_7_days(self, frozen_now):
         """Test that only events within 7 days are used."""
-        now = datetime.now()
+        now = frozen_now
         
         # Create events: 5 recent, 5 old (>7 days)
         recent_events = [
@@ -177,56 +198,30 @@ class TestBaselineComputation:
         
         # Should only use recent events
         assert result.metrics.sample_count == 5
-        assert result.metrics.median_cost == 3.0  # Median of 1.0 to 5.0
+        assert result.metrics.median_cost == pytest.approx(3.0)  # Median of 1.0 to 5.0
     
-    def test_event_limit_enforcement_200_events(self):
+    def test_event_limit_enforcement_200_events(self, frozen_now, big_event_list):
         """Test that only last 200 events are used."""
-        now = datetime.now()
+        result = compute_baseline(big_event_list)
         
-        # Create 250 events
-        events = [
-            self.create_test_event(
-                cost=float(i) + 1.0,
-                tokens=(i + 1) * 10,
-                timestamp=now - timedelta(minutes=i)
-            )
-            for i in range(250)  # 250 events > 200 limit
-        ]
-        
-        result = compute_baseline(events)
-        
-        # Should only use last 200 events
+        # Should only use the newest 200 of 250 events
         assert result.metrics.sample_count == 200
-        # Median should be of events 0-199 (newest 200)
-        assert result.metrics.median_cost == 100.5  # Median of 1.0 to 200.0
+        assert result.metrics.median_cost == pytest.approx(100.5)  # Median of 1.0 to 200.0
     
-    def test_deterministic_ordering(self):
+    def test_deterministic_ordering(self, frozen_now):
         """Test that same input produces same output."""
-        now = datetime.now()
-        events = [
-            self.create_test_event(
-                cost=float(i) + 1.0,
-                tokens=(i + 1) * 10,
-                timestamp=now - timedelta(hours=i)
-            )
-            for i in range(30)
-        ]
+        events = list(_hourly_ramp_events(30, frozen_now))
         
-        # Compute baseline twice
+        # Compute baseline twice, the second time from reversed input
         result1 = compute_baseline(events)
-        result2 = compute_baseline(events)
+        result2 = compute_baseline(events[::-1])
         
-        # Results should be identical
-        assert result1.metrics.median_cost == result2.metrics.median_cost
-        assert result1.metrics.p90_cost == result2.metrics.p90_cost
-        assert result1.metrics.median_tokens == result2.metrics.median_tokens
-        assert result1.state == result2.state
-        assert result1.window_start == result2.window_start
-        assert result1.window_end == result2.window_end
+        # Results should be identical; frozen dataclasses compare every field
+        assert result1 == result2
     
-    def test_time_window_correctness(self):
+    def test_time_window_correctness(self, frozen_now):
         """Test that time window is computed correctly."""
-        now = datetime.now()
+        now = frozen_now
         events = [
             self.create_test_event(
                 cost=1.0,
@@ -253,8 +248,8 @@ class TestBaselineComputation:
         assert result.window_start == events[0].timestamp  # Oldest (3 hours ago)
         assert result.window_start < result.window_end
     
-    def test_median_correctness_with_duplicates(self):
-        now = datetime.now()
+    def test_median_correctness_with_duplicates(self, frozen_now):
+        now = frozen_now
         events = [
             self.create_test_event(
                 cost=5.0,
@@ -267,12 +262,12 @@ class TestBaselineComputation:
         result = compute_baseline(events)
         
         # Median should be 5.0 (all values are the same)
-        assert result.metrics.median_cost == 5.0
-        assert result.metrics.p90_cost == 5.0
+        assert result.metrics.median_cost == pytest.approx(5.0)
+        assert result.metrics.p90_cost == pytest.approx(5.0)
     
-    def test_p90_correctness_with_outliers(self):
+    def test_p90_correctness_with_outliers(self, frozen_now):
         """Test P90 computation with outlier values."""
-        now = datetime.now()
+        now = frozen_now
         
         # Create events with costs that will produce a P90 > 1.0
         events = [
@@ -289,11 +284,11 @@ class TestBaselineComputation:
         # P90 should be greater than median and less than max
         assert result.metrics.p90_cost > result.metrics.median_cost
         assert result.metrics.p90_cost < 20.0  # Less than maximum
-        assert result.metrics.median_cost == 10.5  # Median of 1.0 to 20.0
+        assert result.metrics.median_cost == pytest.approx(10.5)  # Median of 1.0 to 20.0
     
-    def test_token_median_correctness(self):
+    def test_token_median_correctness(self, frozen_now):
         """Test token median computation."""
-        now = datetime.now()
+        now = frozen_now
         events = [
             self.create_test_event(
                 cost=1.0,
@@ -319,9 +314,9 @@ class TestBaselineComputation:
                 sample_count=10
             )
     
-    def test_baseline_result_validation(self):
+    def test_baseline_result_validation(self, frozen_now):
         """Test that baseline result time window is validated."""
-        now = datetime.now()
+        now = frozen_now
         past = now - timedelta(hours=1)
         
         with pytest.raises(ValueError, match="window_start must be before window_end"):
@@ -332,9 +327,9 @@ class TestBaselineComputation:
                 window_end=past
             )
     
-    def test_events_outside_window_ignored(self):
+    def test_events_outside_window_ignored(self, frozen_now):
         """Test that events outside 7-day window are completely ignored."""
-        now = datetime.now()
+        now = frozen_now
         
         # Mix of events within and outside window
         events = []
@@ -363,4 +358,4 @@ class TestBaselineComputation:
         
         # Should only count events within window
         assert result.metrics.sample_count == 5
-        assert result.metrics.median_cost == 3.0  # Median of 1.0, 2.0, 3.0, 4.0, 5.0
+        assert result.metrics.median_cost == pytest.approx(3.0)  # Median of 1.0, 2.0, 3.0, 4.0, 5.0
@@ -4,8 +4,7 @@ Unit tests for configuration loading and validation.
 Tests strict validation and error handling for guardrail configs.
 """
 
-import os
-import tempfile
+import re
 from pathlib import Path
 
 import pytest
@@ -13,33 +12,194 @@ import yaml
 
 from ai_cost_guard.config.loader import (
     load_guardrail_config,
+    _validate_config,
     BudgetConfig,
     FeatureGuardrailConfig,
     GuardrailConfig,
     BreachAction
 )
 
+try:
+    from yaml import CSafeDumper as _SafeDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper as _SafeDumper
 
-class TestConfigLoading:
-    """Test configuration loading and validation."""
-    
-    def setup_method(self):
-        """Set up test environment."""
-        self.temp_dir = tempfile.mkdtemp()
+
+_BUDGET = {"daily": 100.0, "monthly": 3000.0}
+_DEFAULTS = {"max_cost_per_request": 5.0, "action_on_breach": "warn"}
+
+
+def _base_config(action: str) -> dict:
+    """Minimal valid configuration with the given default breach action."""
+    return {
+        "budget": _BUDGET,
+        "defaults": {"max_cost_per_request": 5.0, "action_on_breach": action}
+    }
+
+
+# The "warn" base config serialized once; tests that only add or tweak a
+# line work on these bytes instead of dumping YAML again
+_BASE_YAML = yaml.dump(_base_config("warn"), Dumper=_SafeDumper).encode("utf-8")
+
+
+# (config_data, expected error pattern) for configurations the loader must
+# reject; patterns are compiled once here rather than on every raises()
+INVALID_CASES = [
+    pytest.param(
+        {"defaults": _DEFAULTS},
+        re.compile("Missing required 'budget' section"),
+        id="missing-budget"
+    ),
+    pytest.param(
+        {"budget": _BUDGET},
+        re.compile("Missing required 'defaults' section"),
+        id="missing-defaults"
+    ),
+    pytest.param(
+        {"budget": {"monthly": 3000.0}, "defaults": _DEFAULTS},
+        re.compile("Missing required 'daily' budget"),
+        id="missing-daily-budget"
+    ),
+    pytest.param(
+        {"budget": {"daily": 100.0}, "defaults": _DEFAULTS},
+        re.compile("Missing required 'monthly' budget"),
+        id="missing-monthly-budget"
+    ),
+    pytest.param(
+        {"budget": {"daily": -10.0, "monthly": 3000.0}, "defaults": _DEFAULTS},
+        re.compile("daily budget must be > 0"),
+        id="negative-daily-budget"
+    ),
+    pytest.param(
+        {"budget": {"daily": 100.0, "monthly": -100.0}, "defaults": _DEFAULTS},
+        re.compile("monthly budget must be > 0"),
+        id="negative-monthly-budget"
+    ),
+    pytest.param(
+        {"budget": {"daily": 0.0, "monthly": 3000.0}, "defaults": _DEFAULTS},
+        re.compile("daily budget must be > 0"),
+        id="zero-daily-budget"
+    ),
+    pytest.param(
+        {
+            "budget": _BUDGET,
+            "defaults": {"max_cost_per_request": 5.0, "action_on_breach": "invalid_action"}
+        },
+        re.compile("must be one of"),
+        id="invalid-action-on-breach"
+    ),
+    pytest.param(
+        {
+            "budget": _BUDGET,
+            "defaults": {"max_cost_per_request": -5.0, "action_on_breach": "warn"}
+        },
+        re.compile("must be > 0"),
+        id="negative-max-cost-per-request"
+    ),
+    pytest.param(
+        {
+            "budget": _BUDGET,
+            "defaults": {"max_cost_per_request": 0.0, "action_on_breach": "warn"}
+        },
+        re.compile("must be > 0"),
+        id="zero-max-cost-per-request"
+    ),
+    pytest.param(
+        {"budget": _BUDGET, "defaults": _DEFAULTS, "unknown_key": "value"},
+        re.compile("Unknown configuration keys"),
+        id="unknown-top-level-key"
+    ),
+    pytest.param(
+        {
+            "budget": {"daily": 100.0, "monthly": 3000.0, "weekly": 700.0},
+            "defaults": _DEFAULTS
+        },
+        re.compile("Unknown budget keys"),
+        id="unknown-budget-key"
+    ),
+    pytest.param(
+        {
+            "budget": _BUDGET,
+            "defaults": _DEFAULTS,
+            "features": {
+                "chat_completion": {
+                    "max_cost_per_request": 10.0,
+                    "action_on_breach": "block",
+                    "unknown_setting": "value"
+                }
+            }
+        },
+        re.compile("Unknown keys in features.chat_completion"),
+        id="unknown-feature-key"
+    ),
+    pytest.param(
+        {
+            "budget": _BUDGET,
+            "defaults": _DEFAULTS,
+            "features": {"chat_completion": {"max_cost_per_request": 10.0}}
+        },
+        re.compile("Missing required 'action_on_breach' in features.chat_completion"),
+        id="partial-feature-config"
+    ),
+    pytest.param(
+        {"budget": _BUDGET, "defaults": {"max_cost_per_request": 5.0}},
+        re.compile("Missing required 'action_on_breach' in defaults"),
+        id="partial-defaults-config"
+    ),
+    pytest.param(
+        {"budget": "not_a_dict", "defaults": _DEFAULTS},
+        re.compile("'budget' must be a dictionary"),
+        id="budget-not-a-dict"
+    ),
+    pytest.param(
+        {"budget": _BUDGET, "defaults": _DEFAULTS, "features": "not_a_dict"},
+        re.compile("'features' must be a dictionary"),
+        id="features-not-a-dict"
+    ),
+    pytest.param(
+        {"budget": _BUDGET, "defaults": "not_a_dict"},
+        re.compile("'defaults' must be a dictionary"),
+        id="defaults-not-a-dict"
+    ),
+    pytest.param(
+        {
+            "budget": _BUDGET,
+            "defaults": _DEFAULTS,
+            "features": {"chat_completion": "not_a_dict"}
+        },
+        re.compile("Feature 'chat_completion' must be a dictionary"),
+        id="feature-not-a-dict"
+    ),
+]
+
+
+@pytest.fixture
+def write_cfg(tmp_path):
+    """Return a helper that writes configuration data to a YAML file in tmp_path."""
+    def write(config_data: dict, filename: str = "config.yaml") -> str:
+        config_path = tmp_path / filename
+        with open(config_path, 'w', encoding='utf-8') as f:
+            yaml.dump(config_data, f, Dumper=_SafeDumper)
+        return str(config_path)
     
-    def teardown_method(self):
-        """Clean up test environment."""
-        import shutil
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    return write
+
+
+@pytest.fixture
+def write_raw(tmp_path):
+    """Return a helper that writes pre-serialized YAML bytes to tmp_path."""
+    def write(content: bytes, filename: str = "config.yaml") -> str:
+        config_path = tmp_path / filename
+        config_path.write_bytes(content)
+        return str(config_path)
     
-    def _write_config(self, config_data: dict, filename: str = "config.yaml") -> str:
-        """Write configuration data to temporary file."""
-        config_path = os.path.join(self.temp_dir, filename)
-        with open(config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(config_data, f)
-        return config_path
+    return write
+
+
+class TestConfigLoading:
+    """Test configuration loading and validation."""
     
-    def test_valid_config_loads_correctly(self):
+    def test_valid_config_loads_correctly(self, write_cfg):
         """Test that a valid configuration loads correctly."""
         config_data = {
             "budget": {
@@ -58,7 +218,7 @@ class TestConfigLoading:
             }
         }
         
-        config_path = self._write_config(config_data)
+        config_path = write_cfg(config_data)
         config = load_guardrail_config(config_path)
         
         # Verify budget
@@ -75,7 +235,7 @@ class TestConfigLoading:
         assert chat_config.max_cost_per_request == 10.0
         assert chat_config.action_on_breach == BreachAction.BLOCK
     
-    def test_config_without_features_loads_correctly(self):
+    def test_config_without_features_loads_correctly(self, write_cfg):
         """Test that config without features section loads correctly."""
         config_data = {
             "budget": {
@@ -88,13 +248,13 @@ class TestConfigLoading:
             }
         }
         
-        config_path = self._write_config(config_data)
+        config_path = write_cfg(config_data)
         config = load_guardrail_config(config_path)
         
         assert len(config.features) == 0
         assert config.defaults.action_on_breach == BreachAction.THROTTLE
     
-    def test_get_feature_config_with_defaults(self):
+    def test_get_feature_config_with_defaults(self, write_cfg):
         """Test feature config lookup with defaults fallback."""
         config_data = {
             "budget": {"daily": 100.0, "monthly": 3000.0},
@@ -110,7 +270,7 @@ class TestConfigLoading:
             }
         }
         
-        config_path = self._write_config(config_data)
+        config_path = write_cfg(config_data)
         config = load_guardrail_config(config_path)
         
         # Test configured feature
@@ -128,384 +288,82 @@ class TestConfigLoading:
         with pytest.raises(FileNotFoundError, match="Guardrail config file not found"):
             load_guardrail_config("nonexistent.yaml")
     
-    def test_empty_config_raises_error(self):
+    def test_empty_config_raises_error(self, write_cfg):
         """Test that empty config file raises error."""
-        config_path = self._write_config({})
+        config_path = write_cfg({})
         
         with pytest.raises(ValueError, match="Configuration file is empty"):
             load_guardrail_config(config_path)
     
-    def test_invalid_yaml_raises_error(self):
+    def test_invalid_yaml_raises_error(self, tmp_path):
         """Test that invalid YAML raises error."""
-        config_path = os.path.join(self.temp_dir, "invalid.yaml")
+        config_path = tmp_path / "invalid.yaml"
         with open(config_path, 'w') as f:
             f.write("invalid: yaml: content: [")
         
         with pytest.raises(yaml.YAMLError):
             load_guardrail_config(config_path)
     
-    def test_missing_budget_raises_error(self):
-        """Test that missing budget section raises error."""
-        config_data = {
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Missing required 'budget' section"):
-            load_guardrail_config(config_path)
-    
-    def test_missing_defaults_raises_error(self):
-        """Test that missing defaults section raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Missing required 'defaults' section"):
-            load_guardrail_config(config_path)
-    
-    def test_missing_daily_budget_raises_error(self):
-        """Test that missing daily budget raises error."""
-        config_data = {
-            "budget": {
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Missing required 'daily' budget"):
-            load_guardrail_config(config_path)
-    
-    def test_missing_monthly_budget_raises_error(self):
-        """Test that missing monthly budget raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Missing required 'monthly' budget"):
-            load_guardrail_config(config_path)
-    
-    def test_negative_daily_budget_raises_error(self):
-        """Test that negative daily budget raises error."""
-        config_data = {
-            "budget": {
-                "daily": -10.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="daily budget must be > 0"):
-            load_guardrail_config(config_path)
-    
-    def test_negative_monthly_budget_raises_error(self):
-        """Test that negative monthly budget raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": -100.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="monthly budget must be > 0"):
-            load_guardrail_config(config_path)
-    
-    def test_zero_daily_budget_raises_error(self):
-        """Test that zero daily budget raises error."""
-        config_data = {
-            "budget": {
-                "daily": 0.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="daily budget must be > 0"):
-            load_guardrail_config(config_path)
-    
-    def test_invalid_action_on_breach_raises_error(self):
-        """Test that invalid action_on_breach raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "invalid_action"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="must be one of"):
-            load_guardrail_config(config_path)
-    
-    def test_negative_max_cost_per_request_raises_error(self):
-        """Test that negative max_cost_per_request raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": -5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="must be > 0"):
-            load_guardrail_config(config_path)
-    
-    def test_zero_max_cost_per_request_raises_error(self):
-        """Test that zero max_cost_per_request raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 0.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="must be > 0"):
-            load_guardrail_config(config_path)
+    @pytest.mark.parametrize("config_data,match", INVALID_CASES)
+    def test_invalid_config_raises_error(self, config_data, match):
+        """Test that each invalid configuration is rejected with a clear error."""
+        with pytest.raises(ValueError, match=match):
+            _validate_config(config_data)
     
-    def test_unknown_top_level_keys_raise_error(self):
-        """Test that unknown top-level keys raise error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            },
-            "unknown_key": "value"
-        }
-        
-        config_path = self._write_config(config_data)
+    def test_invalid_config_file_raises_error(self, write_raw):
+        """Test that validation errors surface through the file loader."""
+        config_path = write_raw(_BASE_YAML + b"unknown_key: value\n")
         with pytest.raises(ValueError, match="Unknown configuration keys"):
             load_guardrail_config(config_path)
     
-    def test_unknown_budget_keys_raise_error(self):
-        """Test that unknown budget keys raise error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0,
-                "weekly": 700.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Unknown budget keys"):
-            load_guardrail_config(config_path)
-    
-    def test_unknown_feature_keys_raise_error(self):
-        """Test that unknown feature keys raise error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            },
-            "features": {
-                "chat_completion": {
-                    "max_cost_per_request": 10.0,
-                    "action_on_breach": "block",
-                    "unknown_setting": "value"
-                }
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Unknown keys in features.chat_completion"):
-            load_guardrail_config(config_path)
-    
-    def test_partial_feature_config_raises_error(self):
-        """Test that partial feature config raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            },
-            "features": {
-                "chat_completion": {
-                    "max_cost_per_request": 10.0
-                    # Missing action_on_breach
-                }
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Missing required 'action_on_breach' in features.chat_completion"):
-            load_guardrail_config(config_path)
-    
-    def test_partial_defaults_config_raises_error(self):
-        """Test that partial defaults config raises error."""
+    def test_case_insensitive_action_on_breach(self, write_cfg):
+        """Test that action_on_breach is case insensitive."""
         config_data = {
             "budget": {
                 "daily": 100.0,
                 "monthly": 3000.0
             },
-            "defaults": {
-                "max_cost_per_request": 5.0
-                # Missing action_on_breach
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Missing required 'action_on_breach' in defaults"):
-            load_guardrail_config(config_path)
-    
-    def test_invalid_budget_type_raises_error(self):
-        """Test that invalid budget type raises error."""
-        config_data = {
-            "budget": "not_a_dict",
             "defaults": {
                 "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
+                "action_on_breach": "BLOCK"
             }
         }
         
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="'budget' must be a dictionary"):
-            load_guardrail_config(config_path)
-    
-    def test_invalid_features_type_raises_error(self):
-        """Test that invalid features type raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            },
-            "features": "not_a_dict"
-        }
+        config_path = write_cfg(config_data)
+        config = load_guardrail_config(config_path)
         
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="'features' must be a dictionary"):
-            load_guardrail_config(config_path)
+        assert config.defaults.action_on_breach == BreachAction.BLOCK
     
-    def test_invalid_defaults_type_raises_error(self):
-        """Test that invalid defaults type raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": "not_a_dict"
-        }
+    @pytest.mark.parametrize("action", ["warn", "block", "throttle", "downgrade"])
+    def test_valid_action(self, write_cfg, action):
+        """Test each valid breach action loads as its BreachAction."""
+        config_path = write_cfg(_base_config(action))
+        config = load_guardrail_config(config_path)
         
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="'defaults' must be a dictionary"):
-            load_guardrail_config(config_path)
+        assert config.defaults.action_on_breach == BreachAction(action)
     
-    def test_invalid_feature_type_raises_error(self):
-        """Test that invalid feature type raises error."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "warn"
-            },
-            "features": {
-                "chat_completion": "not_a_dict"
-            }
-        }
+    def test_unchanged_config_is_served_from_cache(self, write_raw):
+        """Test that reloading an unchanged file returns the cached config."""
+        config_path = write_raw(_BASE_YAML)
         
-        config_path = self._write_config(config_data)
-        with pytest.raises(ValueError, match="Feature 'chat_completion' must be a dictionary"):
-            load_guardrail_config(config_path)
+        assert load_guardrail_config(config_path) is load_guardrail_config(config_path)
     
-    def test_case_insensitive_action_on_breach(self):
-        """Test that action_on_breach is case insensitive."""
-        config_data = {
-            "budget": {
-                "daily": 100.0,
-                "monthly": 3000.0
-            },
-            "defaults": {
-                "max_cost_per_request": 5.0,
-                "action_on_breach": "BLOCK"
-            }
-        }
-        
-        config_path = self._write_config(config_data)
-        config = load_guardrail_config(config_path)
-        
-        assert config.defaults.action_on_breach == BreachAction.BLOCK
+    def test_modified_config_is_reloaded(self, write_raw):
+        """Test that editing the file invalidates the cached config."""
+        config_path = write_raw(_BASE_YAML)
+        first = load_guardrail_config(config_path)
+        
+        write_raw(_BASE_YAML.replace(
+            b"max_cost_per_request: 5.0", b"max_cost_per_request: 25.0"
+        ))
+        second = load_guardrail_config(config_path)
+        
+        assert first.defaults.max_cost_per_request == 5.0
+        assert second.defaults.max_cost_per_request == 25.0
     
-    def test_all_valid_actions(self):
-        """Test all valid breach actions."""
-        valid_actions = ["warn", "block", "throttle", "downgrade"]
+    def test_cached_features_are_read_only(self, write_raw):
+        """Test that the shared cached config cannot be mutated by callers."""
+        config = load_guardrail_config(write_raw(_BASE_YAML))
         
-        for action in valid_actions:
-            config_data = {
-                "budget": {
-                    "daily": 100.0,
-                    "monthly": 3000.0
-                },
-                "defaults": {
-                    "max_cost_per_request": 5.0,
-                    "action_on_breach": action
-                }
-            }
-            
-            config_path = self._write_config(config_data)
-            config = load_guardrail_config(config_path)
-            
-            expected_action = BreachAction(action)
-            assert config.defaults.action_on_breach == expected_action
+        with pytest.raises(TypeError):
+            config.features["chat_completion"] = config.defaults
@@ -1,8 +1,10 @@
 """
 Tests for guardrail enforcement logic.
 """
+from dataclasses import replace
+from datetime import timedelta
+
 import pytest
-from datetime import datetime, timedelta
 
 from ai_cost_guard.core.guardrails import (
     enforce_guardrails,
@@ -16,151 +18,133 @@ from ai_cost_guard.core.baseline import BaselineResult, BaselineMetrics, Baselin
 from ai_cost_guard.storage.models import LLMUsageEvent
 
 
-class TestGuardrailEnforcement:
-    """Test guardrail enforcement logic."""
+def _anomaly(severity, rule="A", message="Test anomaly"):
+    """An anomaly for test_feature/test_model; only severity matters to enforcement."""
+    return AnomalyEvent(
+        feature="test_feature",
+        model="test_model",
+        rule=rule,
+        severity=severity,
+        observed_value=100,
+        baseline_value=10,
+        threshold=50,
+        message=message
+    )
 
-    def create_baseline(self, state=BaselineState.WARM):
-        """Create a test baseline."""
-        return BaselineResult(
-            metrics=BaselineMetrics(
-                median_cost=0.1,
-                p90_cost=0.2,
-                median_tokens=1000,
-                sample_count=100
-            ),
-            state=state,
-            window_start=datetime.now() - timedelta(days=1),
-            window_end=datetime.now()
-        )
 
-    def create_event(self, cost=0.1, tokens=100, retries=1):
-        """Create a test event."""
-        return LLMUsageEvent(
-            timestamp=datetime.now(),
-            feature="test_feature",
-            model="test_model",
-            prompt_tokens=tokens // 2,
-            completion_tokens=tokens // 2,
-            total_tokens=tokens,
-            estimated_cost=cost,
-            retry_count=retries
-        )
+# Baselines and events are frozen, so each is built once per module
+@pytest.fixture(scope="module")
+def warm_baseline(fixed_now):
+    """A WARM baseline over the day before fixed_now."""
+    return BaselineResult(
+        metrics=BaselineMetrics(
+            median_cost=0.1,
+            p90_cost=0.2,
+            median_tokens=1000,
+            sample_count=100
+        ),
+        state=BaselineState.WARM,
+        window_start=fixed_now - timedelta(days=1),
+        window_end=fixed_now
+    )
+
+
+@pytest.fixture(scope="module")
+def cold_baseline(warm_baseline):
+    """The warm baseline's window and metrics, marked COLD."""
+    return replace(warm_baseline, state=BaselineState.COLD)
+
+
+@pytest.fixture(scope="module")
+def usage_event(fixed_now):
+    """A cheap 100-token event with one retry."""
+    return LLMUsageEvent(
+        timestamp=fixed_now,
+        feature="test_feature",
+        model="test_model",
+        prompt_tokens=50,
+        completion_tokens=50,
+        total_tokens=100,
+        estimated_cost=0.1,
+        retry_count=1
+    )
+
+
+@pytest.fixture(scope="module")
+def expensive_event(usage_event):
+    """The usage event at a cost of 2.0, above a 1.0 per-request cap."""
+    return replace(usage_event, estimated_cost=2.0)
 
-    def test_max_cost_per_request_block(self):
+
+class TestGuardrailEnforcement:
+    """Test guardrail enforcement logic."""
+
+    def test_max_cost_per_request_block(self, warm_baseline, expensive_event):
         """Test blocking when request exceeds max cost."""
         config = GuardrailConfig(max_cost_per_request=1.0)
-        baseline = self.create_baseline()
-        event = self.create_event(cost=2.0)
         
         with pytest.raises(GuardrailViolation) as excinfo:
             enforce_guardrails(
                 "test_feature", "test_model", 
-                config, baseline, event, [], BudgetState(0, 100, 30)
+                config, warm_baseline, expensive_event, [], BudgetState(0, 100, 30)
             )
         
         assert excinfo.value.action == EnforcementAction.BLOCK
         assert "exceeds maximum allowed" in str(excinfo.value)
 
-    def test_budget_breach_action(self):
+    def test_budget_breach_action(self, warm_baseline, usage_event):
         """Test budget breach triggers configured action."""
         config = GuardrailConfig(
             budget_limit=100,
             on_budget_breach=EnforcementAction.THROTTLE
         )
-        baseline = self.create_baseline()
-        event = self.create_event()
         
         with pytest.raises(GuardrailViolation) as excinfo:
             enforce_guardrails(
                 "test_feature", "test_model",
-                config, baseline, event, [],
+                config, warm_baseline, usage_event, [],
                 BudgetState(amount_used=100, amount_remaining=0, budget_period_days=30)
             )
         
         assert excinfo.value.action == EnforcementAction.THROTTLE
 
-    def test_critical_anomaly_enforcement(self):
-        """Test critical anomaly triggers enforcement."""
+    def test_block_stops_evaluating_remaining_anomalies(self, warm_baseline, usage_event):
+        """Test enforcement raises as soon as BLOCK is reached."""
         config = GuardrailConfig(on_critical_anomaly=EnforcementAction.BLOCK)
-        baseline = self.create_baseline()
-        event = self.create_event()
-        anomalies = [
-            AnomalyEvent(
-                feature="test_feature",
-                model="test_model",
-                rule="A",
-                severity=AnomalySeverity.CRITICAL,
-                observed_value=100,
-                baseline_value=10,
-                threshold=50,
-                message="Critical cost anomaly"
-            )
-        ]
+        critical = _anomaly(AnomalySeverity.CRITICAL, message="Critical cost anomaly")
+        # The second entry would fail if it were ever inspected
+        anomalies = [critical, None]
         
         with pytest.raises(GuardrailViolation) as excinfo:
             enforce_guardrails(
                 "test_feature", "test_model",
-                config, baseline, event, anomalies,
+                config, warm_baseline, usage_event, anomalies,
                 BudgetState(0, 100, 30)
             )
         
         assert excinfo.value.action == EnforcementAction.BLOCK
+        assert "Critical cost anomaly" in str(excinfo.value)
 
-    def test_warning_anomaly_no_enforcement(self):
-        """Test warning anomaly doesn't enforce by default."""
-        config = GuardrailConfig()
-        baseline = self.create_baseline()
-        event = self.create_event()
-        anomalies = [
-            AnomalyEvent(
-                feature="test_feature",
-                model="test_model",
-                rule="B",
-                severity=AnomalySeverity.WARNING,
-                observed_value=100,
-                baseline_value=50,
-                threshold=85,
-                message="Warning token anomaly"
-            )
-        ]
-        
-        # Should not raise
-        action = enforce_guardrails(
-            "test_feature", "test_model",
-            config, baseline, event, anomalies,
-            BudgetState(0, 100, 30)
+    def test_equal_action_keeps_first_message(self, warm_baseline, usage_event):
+        """Test a later check with the same action does not replace the message."""
+        config = GuardrailConfig(
+            budget_limit=100,
+            on_budget_breach=EnforcementAction.THROTTLE,
+            on_critical_anomaly=EnforcementAction.THROTTLE
         )
+        anomalies = [_anomaly(AnomalySeverity.CRITICAL)]
         
-        assert action == EnforcementAction.WARN
-
-    def test_cold_baseline_suppresses_anomaly_enforcement(self):
-        """Test that cold baselines suppress anomaly enforcement."""
-        config = GuardrailConfig(on_critical_anomaly=EnforcementAction.BLOCK)
-        baseline = self.create_baseline(state=BaselineState.COLD)
-        event = self.create_event()
-        anomalies = [
-            AnomalyEvent(
-                feature="test_feature",
-                model="test_model",
-                rule="A",
-                severity=AnomalySeverity.CRITICAL,
-                observed_value=100,
-                baseline_value=10,
-                threshold=50,
-                message="Critical anomaly"
+        with pytest.raises(GuardrailViolation) as excinfo:
+            enforce_guardrails(
+                "test_feature", "test_model",
+                config, warm_baseline, usage_event, anomalies,
+                BudgetState(amount_used=100, amount_remaining=0, budget_period_days=30)
             )
-        ]
-        
-        # Should not raise despite critical anomaly
-        action = enforce_guardrails(
-            "test_feature", "test_model",
-            config, baseline, event, anomalies,
-            BudgetState(0, 100, 30)
-        )
         
-        assert action == EnforcementAction.ALLOW
+        assert excinfo.value.action == EnforcementAction.THROTTLE
+        assert "Budget limit" in str(excinfo.value)
 
-    def test_enforcement_order_max_cost_first(self):
+    def test_enforcement_order_max_cost_first(self, warm_baseline, expensive_event):
         """Test that max cost is checked before budget and anomalies."""
         config = GuardrailConfig(
             max_cost_per_request=1.0,
@@ -168,16 +152,13 @@ class TestGuardrailEnforcement:
             on_budget_breach=EnforcementAction.BLOCK,
             on_critical_anomaly=EnforcementAction.BLOCK
         )
-        baseline = self.create_baseline()
         
         # This would trigger all checks, but max cost should be first
-        event = self.create_event(cost=2.0)
-        
         with pytest.raises(GuardrailViolation) as excinfo:
             enforce_guardrails(
                 "test_feature", "test_model",
-                config, baseline, event, 
-                [AnomalyEvent("test", "test", "A", AnomalySeverity.CRITICAL, 100, 10, 50, "test")],
+                config, warm_baseline, expensive_event, 
+                [_anomaly(AnomalySeverity.CRITICAL)],
                 BudgetState(amount_used=100, amount_remaining=0, budget_period_days=30)
             )
         
@@ -185,31 +166,52 @@ class TestGuardrailEnforcement:
         assert "exceeds maximum allowed" in str(excinfo.value)
         assert excinfo.value.action == EnforcementAction.BLOCK
 
-    def test_downgrade_action_returns_without_raising(self):
-        """Test DOWNGRADE action returns without raising exception."""
-        config = GuardrailConfig(
-            on_critical_anomaly=EnforcementAction.DOWNGRADE
-        )
-        baseline = self.create_baseline()
-        event = self.create_event()
-        anomalies = [
-            AnomalyEvent(
-                feature="test_feature",
-                model="test_model",
-                rule="A",
-                severity=AnomalySeverity.CRITICAL,
-                observed_value=100,
-                baseline_value=10,
-                threshold=50,
-                message="Critical anomaly"
-            )
+    @pytest.mark.parametrize(
+        "severity,baseline_fixture,on_critical,expected",
+        [
+            # A critical anomaly on a warm baseline raises the configured BLOCK
+            pytest.param(
+                AnomalySeverity.CRITICAL, "warm_baseline", EnforcementAction.BLOCK,
+                EnforcementAction.BLOCK, id="critical-blocks"
+            ),
+            # Warning anomalies only warn by default
+            pytest.param(
+                AnomalySeverity.WARNING, "warm_baseline", EnforcementAction.BLOCK,
+                EnforcementAction.WARN, id="warning-warns"
+            ),
+            # Cold baselines suppress anomaly enforcement entirely
+            pytest.param(
+                AnomalySeverity.CRITICAL, "cold_baseline", EnforcementAction.BLOCK,
+                EnforcementAction.ALLOW, id="cold-baseline-allows"
+            ),
+            # DOWNGRADE is returned rather than raised
+            pytest.param(
+                AnomalySeverity.CRITICAL, "warm_baseline", EnforcementAction.DOWNGRADE,
+                EnforcementAction.DOWNGRADE, id="critical-downgrades"
+            ),
         ]
+    )
+    def test_anomaly_enforcement(
+        self, request, usage_event, severity, baseline_fixture, on_critical, expected
+    ):
+        """Test the action taken for each anomaly severity and baseline state."""
+        config = GuardrailConfig(on_critical_anomaly=on_critical)
+        baseline = request.getfixturevalue(baseline_fixture)
+        anomalies = [_anomaly(severity)]
         
-        # Should not raise, should return DOWNGRADE
-        action = enforce_guardrails(
-            "test_feature", "test_model",
-            config, baseline, event, anomalies,
-            BudgetState(0, 100, 30)
-        )
+        def enforce():
+            return enforce_guardrails(
+                "test_feature", "test_model",
+                config, baseline, usage_event, anomalies,
+                BudgetState(0, 100, 30)
+            )
+        
+        # BLOCK and THROTTLE raise; every other action is returned
+        if expected in (EnforcementAction.BLOCK, EnforcementAction.THROTTLE):
+            with pytest.raises(GuardrailViolation) as excinfo:
+                enforce()
+            action = excinfo.value.action
+        else:
+            action = enforce()
         
-        assert action == EnforcementAction.DOWNGRADE
+        assert action == expected
@@ -1,16 +1,12 @@
-# test_imports.py
-import sys
-print("Python path:", sys.path)
+"""
+Smoke test that the package and its core API import cleanly.
+"""
 
-try:
-    import ai_cost_guard
-    print("✅ ai_cost_guard imported successfully")
-    print("Module location:", ai_cost_guard.__file__)
-except ImportError as e:
-    print("❌ Failed to import ai_cost_guard:", e)
 
-try:
+def test_imports():
+    """Verify the package and GuardrailConfig can be imported."""
+    import ai_cost_guard
     from ai_cost_guard.core.guardrails import GuardrailConfig
-    print("✅ GuardrailConfig imported successfully")
-except ImportError as e:
-    print("❌ Failed to import GuardrailConfig:", e)
\ No newline at end of file
+
+    assert ai_cost_guard.__file__
+    assert GuardrailConfig is not None
@@ -7,7 +7,7 @@ Tests cost accuracy, rounding behavior, and error handling.
 import pytest
 from decimal import Decimal
 
-from ai_cost_guard.core.pricing import calculate_cost, PRICING_TABLE
+from ai_cost_guard.core.pricing import calculate_cost, PRICING_TABLE, ModelPricing
 from ai_cost_guard.core.token_counter import TokenUsage
 
 
@@ -43,81 +43,36 @@ class TestPricingTable:
 class TestCostCalculation:
     """Test cost calculation accuracy and rounding."""
     
-    def test_exact_cost_gpt4(self):
-        """Verify exact cost calculation for GPT-4."""
-        usage = TokenUsage(prompt_tokens=1000, completion_tokens=500)
-        cost = calculate_cost("gpt-4", usage)
-        # Prompt: 1000/1000 * $30.00 = $30.00
-        # Completion: 500/1000 * $60.00 = $30.00
-        # Total: $60.00
-        assert cost == 60.00
-    
-    def test_exact_cost_gpt35_turbo(self):
-        """Verify exact cost calculation for GPT-3.5-Turbo."""
-        usage = TokenUsage(prompt_tokens=2000, completion_tokens=1000)
-        cost = calculate_cost("gpt-3.5-turbo", usage)
-        # Prompt: 2000/1000 * $1.50 = $3.00
-        # Completion: 1000/1000 * $2.00 = $2.00
-        # Total: $5.00
-        assert cost == 5.00
-    
-    def test_exact_cost_claude3_opus(self):
-        """Verify exact cost calculation for Claude-3-Opus."""
-        usage = TokenUsage(prompt_tokens=1500, completion_tokens=300)
-        cost = calculate_cost("claude-3-opus", usage)
-        # Prompt: 1500/1000 * $15.00 = $22.50
-        # Completion: 300/1000 * $75.00 = $22.50
-        # Total: $45.00
-        assert cost == 45.00
-    
-    def test_rounding_up_behavior(self):
-        """Verify costs round UP (conservative bias)."""
-        usage = TokenUsage(prompt_tokens=1, completion_tokens=1)
-        cost = calculate_cost("gpt-3.5-turbo", usage)
-        # Prompt: 1/1000 * $1.50 = $0.0015
-        # Completion: 1/1000 * $2.00 = $0.0020
-        # Total: $0.0035 -> should round UP to $0.01
-        assert cost == 0.01
-    
-    def test_rounding_up_edge_case(self):
-        """Verify rounding up on exact cent boundary."""
-        usage = TokenUsage(prompt_tokens=667, completion_tokens=0)
-        cost = calculate_cost("gpt-3.5-turbo", usage)
-        # Prompt: 667/1000 * $1.50 = $1.0005 -> should round UP to $1.01
-        assert cost == 1.01
-    
-    def test_large_token_counts(self):
-        """Verify calculation with very large token counts."""
-        usage = TokenUsage(prompt_tokens=1000000, completion_tokens=500000)
-        cost = calculate_cost("gpt-4", usage)
-        # Prompt: 1000000/1000 * $30.00 = $30,000.00
-        # Completion: 500000/1000 * $60.00 = $30,000.00
-        # Total: $60,000.00
-        assert cost == 60000.00
-    
-    def test_zero_tokens_cost(self):
-        """Verify cost calculation with zero tokens."""
-        usage = TokenUsage(prompt_tokens=0, completion_tokens=0)
-        cost = calculate_cost("gpt-4", usage)
-        assert cost == 0.00
-    
-    def test_prompt_only_cost(self):
-        """Verify cost calculation with only prompt tokens."""
-        usage = TokenUsage(prompt_tokens=1000, completion_tokens=0)
-        cost = calculate_cost("gpt-4", usage)
-        # Prompt: 1000/1000 * $30.00 = $30.00
-        # Completion: 0/1000 * $60.00 = $0.00
-        # Total: $30.00
-        assert cost == 30.00
-    
-    def test_completion_only_cost(self):
-        """Verify cost calculation with only completion tokens."""
-        usage = TokenUsage(prompt_tokens=0, completion_tokens=1000)
-        cost = calculate_cost("gpt-4", usage)
-        # Prompt: 0/1000 * $30.00 = $0.00
-        # Completion: 1000/1000 * $60.00 = $60.00
-        # Total: $60.00
-        assert cost == 60.00
+    @pytest.mark.parametrize(
+        "model,prompt_tokens,completion_tokens,expected",
+        [
+            # $30.00/1K prompt + $60.00/1K completion: $30.00 + $30.00
+            pytest.param("gpt-4", 1000, 500, Decimal("60.00"), id="exact-gpt4"),
+            # $1.50/1K prompt + $2.00/1K completion: $3.00 + $2.00
+            pytest.param("gpt-3.5-turbo", 2000, 1000, Decimal("5.00"), id="exact-gpt35-turbo"),
+            # $15.00/1K prompt + $75.00/1K completion: $22.50 + $22.50
+            pytest.param("claude-3-opus", 1500, 300, Decimal("45.00"), id="exact-claude3-opus"),
+            # $0.0015 + $0.0020 = $0.0035 rounds UP (conservative bias)
+            pytest.param("gpt-3.5-turbo", 1, 1, Decimal("0.01"), id="rounding-up"),
+            # $1.0005 rounds UP just past a cent boundary
+            pytest.param("gpt-3.5-turbo", 667, 0, Decimal("1.01"), id="rounding-up-edge"),
+            # $30,000.00 + $30,000.00
+            pytest.param("gpt-4", 1000000, 500000, Decimal("60000.00"), id="large-token-counts"),
+            pytest.param("gpt-4", 0, 0, Decimal("0.00"), id="zero-tokens"),
+            pytest.param("gpt-4", 1000, 0, Decimal("30.00"), id="prompt-only"),
+            pytest.param("gpt-4", 0, 1000, Decimal("60.00"), id="completion-only"),
+            # $0.4995 + $1.334 = $1.8335 rounds UP
+            pytest.param("gpt-3.5-turbo", 333, 667, Decimal("1.84"), id="fractional-tokens"),
+            # $0.30 exactly (no float drift) is not bumped up
+            pytest.param("gpt-3.5-turbo", 200, 0, Decimal("0.30"), id="exact-cent-not-rounded-up"),
+        ]
+    )
+    def test_calculate_cost(self, model, prompt_tokens, completion_tokens, expected):
+        """Verify exact cost calculation and conservative rounding."""
+        usage = TokenUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        cost = calculate_cost(model, usage)
+        # Compare as Decimal: the float result must be exactly the expected cents
+        assert Decimal(str(cost)) == expected
     
     def test_unknown_model_error(self):
         """Verify error handling for unknown models."""
@@ -125,11 +80,16 @@ class TestCostCalculation:
         with pytest.raises(ValueError, match="Unsupported model: unknown-model"):
             calculate_cost("unknown-model", usage)
     
-    def test_fractional_token_calculation(self):
-        """Verify precise calculation with fractional tokens."""
+    def test_rate_precision_limit(self):
+        """Verify rates finer than a millionth of a dollar are rejected."""
+        with pytest.raises(ValueError, match="more than 6 decimal places"):
+            ModelPricing(
+                prompt_cost_per_1k=Decimal("0.0000001"),
+                completion_cost_per_1k=Decimal("1.00")
+            )
+    
+    def test_cost_for_matches_calculate_cost(self):
+        """Verify pricing objects compute the same cost as calculate_cost."""
         usage = TokenUsage(prompt_tokens=333, completion_tokens=667)
-        cost = calculate_cost("gpt-3.5-turbo", usage)
-        # Prompt: 333/1000 * $1.50 = $0.4995
-        # Completion: 667/1000 * $2.00 = $1.334
-        # Total: $1.8335 -> should round UP to $1.84
-        assert cost == 1.84
+        pricing = PRICING_TABLE.get_pricing("gpt-3.5-turbo")
+        assert pricing.cost_for(usage) == calculate_cost("gpt-3.5-turbo", usage)
@@ -4,113 +4,163 @@ Unit tests for SDK layer.
 Tests OpenAI client wrapper behavior and usage recording.
 """
 
-import os
-import tempfile
 from datetime import datetime
-from unittest.mock import Mock, patch
+from types import SimpleNamespace
+from unittest.mock import Mock, call
 
 import pytest
 
-from ai_cost_guard.sdk.openai_client import GuardedOpenAI
+from ai_cost_guard.storage.db import get_cached_connection
 from ai_cost_guard.storage.models import LLMUsageEvent
 from ai_cost_guard.storage.repository import fetch_recent_usage_events, initialize_schema
 
 
-class TestGuardedOpenAI:
-    """Test GuardedOpenAI client wrapper."""
+@pytest.fixture(scope="module")
+def GuardedOpenAI():
+    """The GuardedOpenAI class, imported only when an SDK test runs.
     
-    def setup_method(self):
-        """Set up test environment."""
-        self.temp_dir = tempfile.mkdtemp()
-        self.db_path = os.path.join(self.temp_dir, "test.db")
-        initialize_schema(self.db_path)
+    Importing the SDK pulls in the openai package, which takes about half a
+    second; deferring it keeps collection and unrelated -k runs fast.
+    """
+    from ai_cost_guard.sdk.openai_client import GuardedOpenAI
+    return GuardedOpenAI
+
+
+@pytest.fixture(scope="session")
+def shared_db(tmp_path_factory):
+    """Create the test database and its schema once per session.
     
-    def teardown_method(self):
-        """Clean up test environment."""
-        import shutil
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    Durability is irrelevant here, so the cached connection that every SDK
+    write goes through skips fsync entirely, including at WAL checkpoints.
+    """
+    path = str(tmp_path_factory.mktemp("sdk") / "test.db")
+    initialize_schema(path)
+    get_cached_connection(path).execute("PRAGMA synchronous = OFF")
+    return path
+
+
+@pytest.fixture
+def db_path(shared_db):
+    """Hand out the shared database, emptied again after each test."""
+    yield shared_db
+    conn = get_cached_connection(shared_db)
+    conn.execute("DELETE FROM llm_usage_event")
+    conn.commit()
+
+
+@pytest.fixture
+def mock_openai(monkeypatch):
+    """Patch the OpenAI client class to return a client with a canned response.
+    
+    Returns (client, response). The response reports 100 prompt and 50
+    completion tokens; tests override its id or usage, or the client's
+    side_effect, as needed.
+    """
+    # Plain attribute bags: the SDK only reads id and usage
+    response = SimpleNamespace(
+        id="chat_X",
+        usage=SimpleNamespace(prompt_tokens=100, completion_tokens=50, total_tokens=150)
+    )
+    
+    client = Mock()
+    client.chat.completions.create.return_value = response
+    monkeypatch.setattr("ai_cost_guard.sdk.openai_client.OpenAI", lambda **_: client)
+    return client, response
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Capture events the SDK writes one at a time, instead of storing them.
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_init_success(self, mock_openai_class):
+    Returns the list the events are appended to, in write order.
+    """
+    events = []
+    monkeypatch.setattr(
+        "ai_cost_guard.sdk.openai_client.insert_usage_event",
+        lambda event, db_path=None: events.append(event)
+    )
+    return events
+
+
+class TestGuardedOpenAI:
+    """Test GuardedOpenAI client wrapper."""
+    
+    def test_init_success(self, mock_openai, GuardedOpenAI):
         """Test successful initialization."""
-        mock_openai_class.return_value = Mock()
-        
         client = GuardedOpenAI(
             model="gpt-4",
             feature="chat_completion",
-            db_path=self.db_path
+            db_path="usage.db"
         )
         
         assert client.model == "gpt-4"
         assert client.feature == "chat_completion"
-        assert client.db_path == self.db_path
+        assert client.db_path == "usage.db"
         assert client.client is not None
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_init_default_db_path(self, mock_openai_class):
+    def test_init_default_db_path(self, mock_openai, GuardedOpenAI):
         """Test initialization with default database path."""
-        mock_openai_class.return_value = Mock()
-        
         client = GuardedOpenAI(model="gpt-4", feature="chat_completion")
         
         assert client.db_path == ".ai-cost-guard.db"
     
-    def test_init_missing_model(self):
-        """Test initialization fails with missing model."""
-        with pytest.raises(ValueError, match="model is required"):
-            GuardedOpenAI(model="", feature="chat_completion")
-        
-        with pytest.raises(ValueError, match="model is required"):
-            GuardedOpenAI(model=None, feature="chat_completion")
+    @pytest.mark.parametrize(
+        "model,feature,match",
+        [
+            pytest.param("", "chat_completion", "model is required", id="empty-model"),
+            pytest.param(None, "chat_completion", "model is required", id="no-model"),
+            pytest.param("gpt-4", "", "feature is required", id="empty-feature"),
+            pytest.param("gpt-4", None, "feature is required", id="no-feature"),
+        ]
+    )
+    def test_init_validation(self, model, feature, match, GuardedOpenAI):
+        """Test initialization fails with a missing model or feature."""
+        with pytest.raises(ValueError, match=match):
+            GuardedOpenAI(model=model, feature=feature)
+    
+    @pytest.mark.parametrize("batch_size", [0, -1])
+    def test_init_invalid_batch_size(self, batch_size, GuardedOpenAI):
+        """Test a non-positive batch_size is rejected rather than ignored."""
+        with pytest.raises(ValueError, match="batch_size must be at least 1"):
+            GuardedOpenAI(model="gpt-4", feature="chat_completion", batch_size=batch_size)
     
-    def test_init_missing_feature(self):
-        """Test initialization fails with missing feature."""
-        with pytest.raises(ValueError, match="feature is required"):
-            GuardedOpenAI(model="gpt-4", feature="")
+    def test_init_unsupported_model(self, monkeypatch, GuardedOpenAI):
+        """Test initialization fails before any API call for unpriced models."""
+        mock_openai_class = Mock()
+        monkeypatch.setattr("ai_cost_guard.sdk.openai_client.OpenAI", mock_openai_class)
+        
+        with pytest.raises(ValueError, match="Unsupported model: unknown-model"):
+            GuardedOpenAI(model="unknown-model", feature="chat_completion")
         
-        with pytest.raises(ValueError, match="feature is required"):
-            GuardedOpenAI(model="gpt-4", feature=None)
+        mock_openai_class.assert_not_called()
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_chat_success_records_event(self, mock_openai_class):
+    def test_chat_success_records_event(self, mock_openai, recorded, GuardedOpenAI):
         """Test successful chat call records usage event."""
-        # Mock OpenAI response
-        mock_response = Mock()
+        mock_client, mock_response = mock_openai
         mock_response.id = "chat_123"
-        mock_response.usage.prompt_tokens = 100
-        mock_response.usage.completion_tokens = 50
-        mock_response.usage.total_tokens = 150
-        
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_response
-        mock_openai_class.return_value = mock_client
         
         # Create client and make call
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
         response = client.chat(messages=messages)
         
         # Verify OpenAI was called correctly
-        mock_client.chat.completions.create.assert_called_once_with(
+        assert mock_client.chat.completions.create.call_args_list == [call(
             model="gpt-4",
-            messages=messages,
-            temperature=None,
-            max_tokens=None
-        )
+            messages=messages
+        )]
         
         # Verify response is returned unchanged
         assert response == mock_response
         
         # Verify event was recorded
-        events = fetch_recent_usage_events(db_path=self.db_path)
-        assert len(events) == 1
+        assert len(recorded) == 1
         
-        event = events[0]
+        event = recorded[0]
         assert event.feature == "chat_completion"
         assert event.model == "gpt-4"
         assert event.prompt_tokens == 100
@@ -119,25 +169,18 @@ class TestGuardedOpenAI:
         assert event.request_id == "chat_123"
         assert event.estimated_cost == 6.00  # GPT-4: 100/1000*30 + 50/1000*60 = 3.0 + 3.0 = 6.0
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_chat_with_optional_parameters(self, mock_openai_class):
+    def test_chat_with_optional_parameters(self, mock_openai, recorded, GuardedOpenAI):
         """Test chat call with optional parameters."""
-        # Mock OpenAI response
-        mock_response = Mock()
+        mock_client, mock_response = mock_openai
         mock_response.id = "chat_456"
         mock_response.usage.prompt_tokens = 200
         mock_response.usage.completion_tokens = 100
         mock_response.usage.total_tokens = 300
         
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_response
-        mock_openai_class.return_value = mock_client
-        
         # Create client and make call with parameters
         client = GuardedOpenAI(
             model="gpt-3.5-turbo",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
@@ -148,31 +191,27 @@ class TestGuardedOpenAI:
         )
         
         # Verify OpenAI was called with all parameters
-        mock_client.chat.completions.create.assert_called_once_with(
+        assert mock_client.chat.completions.create.call_args_list == [call(
             model="gpt-3.5-turbo",
             messages=messages,
             temperature=0.7,
             max_tokens=1000
-        )
+        )]
         
         # Verify event was recorded with correct cost
-        events = fetch_recent_usage_events(db_path=self.db_path)
-        assert len(events) == 1
-        assert events[0].estimated_cost == 0.50  # GPT-3.5: 200/1000*1.5 + 100/1000*2.0 = 0.3 + 0.2 = 0.5
+        assert len(recorded) == 1
+        assert recorded[0].estimated_cost == 0.50  # GPT-3.5: 200/1000*1.5 + 100/1000*2.0 = 0.3 + 0.2 = 0.5
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_chat_openai_failure_no_event_recorded(self, mock_openai_class):
+    def test_chat_openai_failure_no_event_recorded(self, mock_openai, recorded, GuardedOpenAI):
         """Test OpenAI API failure does not record event."""
         # Mock OpenAI to raise exception
-        mock_client = Mock()
+        mock_client, _ = mock_openai
         mock_client.chat.completions.create.side_effect = Exception("API Error")
-        mock_openai_class.return_value = mock_client
         
         # Create client and make call
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
@@ -182,32 +221,21 @@ class TestGuardedOpenAI:
             client.chat(messages=messages)
         
         # Verify no event was recorded
-        events = fetch_recent_usage_events(db_path=self.db_path)
-        assert len(events) == 0
+        assert len(recorded) == 0
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    @patch('ai_cost_guard.sdk.openai_client.insert_usage_event')
-    def test_chat_db_failure_raises_error(self, mock_insert, mock_openai_class):
+    def test_chat_db_failure_raises_error(self, monkeypatch, mock_openai, GuardedOpenAI):
         """Test database failure raises error without swallowing."""
-        # Mock OpenAI response
-        mock_response = Mock()
+        _, mock_response = mock_openai
         mock_response.id = "chat_789"
-        mock_response.usage.prompt_tokens = 100
-        mock_response.usage.completion_tokens = 50
-        mock_response.usage.total_tokens = 150
-        
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_response
-        mock_openai_class.return_value = mock_client
         
         # Mock database insert to fail
-        mock_insert.side_effect = Exception("DB Error")
+        mock_insert = Mock(side_effect=Exception("DB Error"))
+        monkeypatch.setattr("ai_cost_guard.sdk.openai_client.insert_usage_event", mock_insert)
         
         # Create client and make call
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
@@ -219,22 +247,16 @@ class TestGuardedOpenAI:
         # Verify insert was attempted
         mock_insert.assert_called_once()
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_chat_missing_usage_raises_error(self, mock_openai_class):
+    def test_chat_missing_usage_raises_error(self, mock_openai, GuardedOpenAI):
         """Test response without usage information raises error."""
         # Mock OpenAI response without usage
-        mock_response = Mock()
+        _, mock_response = mock_openai
         mock_response.usage = None
         
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_response
-        mock_openai_class.return_value = mock_client
-        
         # Create client and make call
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
@@ -243,15 +265,11 @@ class TestGuardedOpenAI:
         with pytest.raises(ValueError, match="usage information"):
             client.chat(messages=messages)
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_chat_empty_messages_raises_error(self, mock_openai_class):
+    def test_chat_empty_messages_raises_error(self, mock_openai, GuardedOpenAI):
         """Test empty messages raises error."""
-        mock_openai_class.return_value = Mock()
-        
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         # Verify error is raised for empty messages
@@ -261,25 +279,15 @@ class TestGuardedOpenAI:
         with pytest.raises(ValueError, match="messages is required"):
             client.chat(messages=None)
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_exactly_one_event_per_successful_call(self, mock_openai_class):
+    def test_exactly_one_event_per_successful_call(self, mock_openai, recorded, GuardedOpenAI):
         """Test exactly one event is recorded per successful call."""
-        # Mock OpenAI response
-        mock_response = Mock()
+        _, mock_response = mock_openai
         mock_response.id = "chat_single"
-        mock_response.usage.prompt_tokens = 100
-        mock_response.usage.completion_tokens = 50
-        mock_response.usage.total_tokens = 150
-        
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_response
-        mock_openai_class.return_value = mock_client
         
         # Create client
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
@@ -290,35 +298,24 @@ class TestGuardedOpenAI:
             client.chat(messages=messages)
         
         # Verify exactly 3 events recorded
-        events = fetch_recent_usage_events(db_path=self.db_path)
-        assert len(events) == 3
+        assert len(recorded) == 3
         
-        # Verify all events have unique request IDs
-        request_ids = [event.request_id for event in events]
+        # Verify all recorded have unique request IDs
+        request_ids = [event.request_id for event in recorded]
         assert len(set(request_ids)) == 3
         assert "chat_0" in request_ids
         assert "chat_1" in request_ids
         assert "chat_2" in request_ids
     
-    @patch('ai_cost_guard.sdk.openai_client.OpenAI')
-    def test_chat_with_additional_kwargs(self, mock_openai_class):
+    def test_chat_with_additional_kwargs(self, mock_openai, recorded, GuardedOpenAI):
         """Test chat call passes through additional kwargs."""
-        # Mock OpenAI response
-        mock_response = Mock()
+        mock_client, mock_response = mock_openai
         mock_response.id = "chat_kwargs"
-        mock_response.usage.prompt_tokens = 100
-        mock_response.usage.completion_tokens = 50
-        mock_response.usage.total_tokens = 150
-        
-        mock_client = Mock()
-        mock_client.chat.completions.create.return_value = mock_response
-        mock_openai_class.return_value = mock_client
         
         # Create client and make call with additional kwargs
         client = GuardedOpenAI(
             model="gpt-4",
-            feature="chat_completion",
-            db_path=self.db_path
+            feature="chat_completion"
         )
         
         messages = [{"role": "user", "content": "Hello"}]
@@ -329,16 +326,35 @@ class TestGuardedOpenAI:
             stop=["\n"]
         )
         
-        # Verify all kwargs were passed through
-        mock_client.chat.completions.create.assert_called_once_with(
+        # Verify all kwargs were passed through (unset max_tokens omitted)
+        assert mock_client.chat.completions.create.call_args_list == [call(
             model="gpt-4",
             messages=messages,
             temperature=0.5,
-            max_tokens=None,
             stream=True,
             stop=["\n"]
-        )
+        )]
         
         # Verify event was still recorded
-        events = fetch_recent_usage_events(db_path=self.db_path)
-        assert len(events) == 1
+        assert len(recorded) == 1
+    
+    def test_batched_events_written_on_close(self, mock_openai, db_path, GuardedOpenAI):
+        """Test buffered usage events are written when the client closes."""
+        _, mock_response = mock_openai
+        mock_response.id = "chat_batched"
+        
+        messages = [{"role": "user", "content": "Hello"}]
+        with GuardedOpenAI(
+            model="gpt-4",
+            feature="chat_completion",
+            db_path=db_path,
+            batch_size=10
+        ) as client:
+            client.chat(messages=messages)
+            client.chat(messages=messages)
+            
+            # Still buffered
+            assert len(fetch_recent_usage_events(db_path=db_path)) == 0
+        
+        events = fetch_recent_usage_events(db_path=db_path)
+        assert len(events) == 2
@@ -2,11 +2,15 @@
 Tests for the cost simulation engine.
 """
 from datetime import datetime, timedelta
-from unittest.mock import MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
 
 import pytest
 
 from ai_cost_guard.core.simulation import (
+    _EventGroup,
+    _create_baseline_from_group,
+    _determine_overall_verdict,
     SimulationVerdict,
     simulate_cost_impact,
     FeatureSimulationResult,
@@ -20,8 +24,31 @@ from ai_cost_guard.core.guardrails import (
     BudgetState
 )
 from ai_cost_guard.storage.models import LLMUsageEvent
+from ai_cost_guard.storage.repository import event_to_row
 
 
+# Same instant as the conftest fixed_now fixture; simulation never reads the clock
+_FIXED_NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+_WARNING_ANOMALY = AnomalyEvent(
+    feature="test_feature",
+    model="test_model",
+    rule="B",
+    severity=AnomalySeverity.WARNING,
+    observed_value=1000,
+    baseline_value=500,
+    threshold=850,
+    message="High token usage"
+)
+
+
+@pytest.fixture
+def mock_detect(monkeypatch):
+    """Replace the simulation's anomaly detection; set its return_value per test."""
+    detect = Mock(return_value=[])
+    monkeypatch.setattr("ai_cost_guard.core.simulation.detect_anomalies", detect)
+    return detect
+
 class TestSimulation:
     """Test simulation functionality."""
 
@@ -34,12 +61,13 @@ class TestSimulation:
         retries=0
     ) -> LLMUsageEvent:
         """Create a test LLM usage event."""
+        half = tokens // 2
         return LLMUsageEvent(
-            timestamp=datetime.now(),
+            timestamp=_FIXED_NOW,
             feature=feature,
             model=model,
-            prompt_tokens=tokens // 2,
-            completion_tokens=tokens // 2,
+            prompt_tokens=half,
+            completion_tokens=tokens - half,
             total_tokens=tokens,
             estimated_cost=cost,
             retry_count=retries
@@ -50,9 +78,13 @@ class TestSimulation:
         if events is None:
             events = [self.create_test_event()]
             
-        mock_repo = MagicMock()
-        mock_repo.get_recent_events.return_value = events
-        return mock_repo
+        # A plain attribute bag: simulation only calls these two methods,
+        # and a MagicMock costs far more to build for every test
+        rows = [event_to_row(e) for e in events]
+        return SimpleNamespace(
+            schema_initialized=lambda: True,
+            get_recent_rows=lambda *args, **kwargs: rows
+        )
     
     def test_simulate_cost_impact_no_events(self):
         """Test simulation with no historical events."""
@@ -69,16 +101,37 @@ class TestSimulation:
         assert result.estimated_monthly_impact == 0.0
         assert not result.per_feature_results
         
-    def test_simulate_cost_impact_pass_verdict(self):
-        """Test simulation with passing verdict."""
-        # Create test events with normal usage
-        events = [
-            self.create_test_event(cost=1.0, tokens=100),
-            self.create_test_event(cost=1.1, tokens=110),
-            self.create_test_event(cost=0.9, tokens=90),
+    @pytest.mark.parametrize(
+        "costs,tokens,anomalies,expected_verdict,expected_actions",
+        [
+            # Normal usage under every limit
+            pytest.param(
+                [1.0, 1.1, 0.9], [100, 110, 90], None,
+                SimulationVerdict.PASS, set(), id="pass"
+            ),
+            # High token usage flagged as a warning-level anomaly
+            pytest.param(
+                [1.0] * 3, [1000] * 3, [_WARNING_ANOMALY],
+                SimulationVerdict.WARN, {EnforcementAction.WARN}, id="warn"
+            ),
+            # Every request is over the 2.0 max cost, which blocks
+            pytest.param(
+                [3.0] * 3, [100] * 3, None,
+                SimulationVerdict.FAIL, {EnforcementAction.BLOCK}, id="fail"
+            ),
         ]
+    )
+    def test_simulate_cost_impact_verdict(
+        self, request, costs, tokens, anomalies, expected_verdict, expected_actions
+    ):
+        """Test the verdict and violations for normal, anomalous and over-cost usage."""
+        if anomalies is not None:
+            request.getfixturevalue("mock_detect").return_value = anomalies
         
-        mock_repo = self.create_mock_repository(events=events)
+        events = [
+            self.create_test_event(cost=cost, tokens=count)
+            for cost, count in zip(costs, tokens)
+        ]
         config = GuardrailConfig(
             max_cost_per_request=2.0,
             budget_limit=100.0
@@ -87,71 +140,50 @@ class TestSimulation:
         result = simulate_cost_impact(
             feature=None,
             config=config,
-            repository=mock_repo
+            repository=self.create_mock_repository(events=events)
         )
         
-        assert result.overall_verdict == SimulationVerdict.PASS
+        assert result.overall_verdict == expected_verdict
         assert result.estimated_monthly_impact > 0
         assert len(result.per_feature_results) == 1
         
         feature_result = result.per_feature_results[0]
-        assert not feature_result.violations
-        
-    def test_simulate_cost_impact_warn_verdict(self):
-        """Test simulation with warning verdict."""
+        assert {action for action, _ in feature_result.violations} == expected_actions
+    
+    def test_simulate_cost_impact_cold_baseline(self, monkeypatch, mock_detect):
+        """Test simulation with cold baseline suppresses anomalies."""
         # Create test events with warning-level anomalies
         events = [
-            self.create_test_event(cost=1.0, tokens=1000),  # High token usage
-            self.create_test_event(cost=1.0, tokens=1000),
             self.create_test_event(cost=1.0, tokens=1000),
         ]
         
         mock_repo = self.create_mock_repository(events=events)
-        config = GuardrailConfig(
-            max_cost_per_request=2.0,
-            budget_limit=100.0,
-            on_warning_anomaly=EnforcementAction.WARN
-        )
+        config = GuardrailConfig()
         
-        with patch('ai_cost_guard.core.simulation.detect_anomalies') as mock_detect:
-            # Simulate warning anomaly
-            mock_detect.return_value = [
-                AnomalyEvent(
-                    feature="test_feature",
-                    model="test_model",
-                    rule="B",
-                    severity=AnomalySeverity.WARNING,
-                    observed_value=1000,
-                    baseline_value=500,
-                    threshold=850,
-                    message="High token usage"
-                )
-            ]
-            
-            result = simulate_cost_impact(
-                feature=None,
-                config=config,
-                repository=mock_repo
-            )
-            
-            assert result.overall_verdict == SimulationVerdict.WARN
-            assert any(
-                r.violations for r in result.per_feature_results
+        # Simulate that detect_anomalies would return a critical anomaly
+        mock_detect.return_value = [
+            AnomalyEvent(
+                feature="test_feature",
+                model="test_model",
+                rule="A",
+                severity=AnomalySeverity.CRITICAL,
+                observed_value=100,
+                baseline_value=10,
+                threshold=50,
+                message="Critical cost anomaly"
             )
-    
-    def test_simulate_cost_impact_fail_verdict(self):
-        """Test simulation with fail verdict due to blocking violation."""
-        # Create test events that would exceed max cost
-        events = [
-            self.create_test_event(cost=3.0, tokens=100),  # Over max cost
-            self.create_test_event(cost=3.0, tokens=100),
-            self.create_test_event(cost=3.0, tokens=100),
         ]
         
-        mock_repo = self.create_mock_repository(events=events)
-        config = GuardrailConfig(
-            max_cost_per_request=2.0,  # Will trigger BLOCK
-            budget_limit=100.0
+        # But with a cold baseline, it should be suppressed
+        cold_baseline = BaselineResult(
+            metrics=None,
+            state=BaselineState.COLD,
+            window_start=_FIXED_NOW - timedelta(days=1),
+            window_end=_FIXED_NOW
+        )
+        monkeypatch.setattr(
+            "ai_cost_guard.core.simulation._create_baseline_from_group",
+            lambda *args, **kwargs: cold_baseline
         )
         
         result = simulate_cost_impact(
@@ -160,99 +192,101 @@ class TestSimulation:
             repository=mock_repo
         )
         
-        assert result.overall_verdict == SimulationVerdict.FAIL
-        assert any(
-            any(a in (EnforcementAction.BLOCK, EnforcementAction.THROTTLE) 
-                for a, _ in r.violations)
-            for r in result.per_feature_results
-        )
+        # Should pass despite the anomaly due to cold baseline
+        assert result.overall_verdict == SimulationVerdict.PASS
     
-    def test_simulate_cost_impact_cold_baseline(self):
-        """Test simulation with cold baseline suppresses anomalies."""
-        # Create test events with warning-level anomalies
-        events = [
-            self.create_test_event(cost=1.0, tokens=1000),
+    @pytest.mark.parametrize(
+        "feature_violations,expected",
+        [
+            pytest.param([[]], SimulationVerdict.PASS, id="no-violations"),
+            pytest.param(
+                [[(EnforcementAction.WARN, "Warning")]],
+                SimulationVerdict.WARN, id="warn-only"
+            ),
+            pytest.param(
+                [[(EnforcementAction.BLOCK, "Blocked")]],
+                SimulationVerdict.FAIL, id="block"
+            ),
+            pytest.param(
+                [[(EnforcementAction.THROTTLE, "Throttled")]],
+                SimulationVerdict.FAIL, id="throttle"
+            ),
+            # A downgrade is only a suggestion
+            pytest.param(
+                [[(EnforcementAction.DOWNGRADE, "Downgrade")]],
+                SimulationVerdict.PASS, id="downgrade-only"
+            ),
+            pytest.param(
+                [[(EnforcementAction.WARN, "Warning"), (EnforcementAction.THROTTLE, "Throttled")]],
+                SimulationVerdict.FAIL, id="mixed"
+            ),
+            # Across features, the most severe verdict wins
+            pytest.param(
+                [
+                    [(EnforcementAction.WARN, "Warning"), (EnforcementAction.THROTTLE, "Throttled")],
+                    [(EnforcementAction.WARN, "Warning")],
+                ],
+                SimulationVerdict.FAIL, id="multiple-features"
+            ),
         ]
-        
-        mock_repo = self.create_mock_repository(events=events)
-        config = GuardrailConfig()
-        
-        with patch('ai_cost_guard.core.simulation.detect_anomalies') as mock_detect:
-            # Simulate that detect_anomalies would return a critical anomaly
-            mock_detect.return_value = [
-                AnomalyEvent(
-                    feature="test_feature",
-                    model="test_model",
-                    rule="A",
-                    severity=AnomalySeverity.CRITICAL,
-                    observed_value=100,
-                    baseline_value=10,
-                    threshold=50,
-                    message="Critical cost anomaly"
-                )
-            ]
-            
-            # But with a cold baseline, it should be suppressed
-            with patch('ai_cost_guard.core.simulation._create_baseline_from_events') as mock_baseline:
-                mock_baseline.return_value = BaselineResult(
-                    metrics=None,
-                    state=BaselineState.COLD,
-                    window_start=datetime.now() - timedelta(days=1),
-                    window_end=datetime.now()
-                )
-                
-                result = simulate_cost_impact(
-                    feature=None,
-                    config=config,
-                    repository=mock_repo
-                )
-                
-                # Should pass despite the anomaly due to cold baseline
-                assert result.overall_verdict == SimulationVerdict.PASS
-    
-    def test_determine_overall_verdict(self):
+    )
+    def test_determine_overall_verdict(self, feature_violations, expected):
         """Test verdict determination logic."""
-        from ai_cost_guard.core.simulation import _determine_overall_verdict, FeatureSimulationResult
-        
-        # Test PASS with no violations
         results = [
             FeatureSimulationResult(
-                feature="test1",
-                model="model1",
+                feature=f"test{i}",
+                model=f"model{i}",
                 estimated_monthly_cost=10.0,
-                violations=[],
+                violations=violations,
                 anomalies=[]
             )
+            for i, violations in enumerate(feature_violations, start=1)
+        ]
+        assert _determine_overall_verdict(results) == expected
+
+    def test_create_baseline_from_group(self):
+        """Test simulation baseline statistics and time window."""
+        now = _FIXED_NOW
+        events = [
+            LLMUsageEvent(
+                timestamp=now - timedelta(hours=h),
+                feature="test_feature",
+                model="test_model",
+                prompt_tokens=tokens // 2,
+                completion_tokens=tokens // 2,
+                total_tokens=tokens,
+                estimated_cost=cost
+            )
+            for h, cost, tokens in [(2, 3.0, 300), (5, 1.0, 100), (1, 2.0, 200), (3, 4.0, 400)]
         ]
-        assert _determine_overall_verdict(results) == SimulationVerdict.PASS
-        
-        # Test WARN with only warnings
-        results[0].violations = [(EnforcementAction.WARN, "Warning")]
-        assert _determine_overall_verdict(results) == SimulationVerdict.WARN
         
-        # Test FAIL with blocking violation
-        results[0].violations = [(EnforcementAction.BLOCK, "Blocked")]
-        assert _determine_overall_verdict(results) == SimulationVerdict.FAIL
+        group = _EventGroup()
+        for event in events:
+            group.add(event_to_row(event))
         
-        # Test FAIL with throttling violation
-        results[0].violations = [(EnforcementAction.THROTTLE, "Throttled")]
-        assert _determine_overall_verdict(results) == SimulationVerdict.FAIL
+        baseline = _create_baseline_from_group(group)
         
-        # Test WARN with mixed violations
-        results[0].violations = [
-            (EnforcementAction.WARN, "Warning"),
-            (EnforcementAction.THROTTLE, "Throttled")
-        ]
-        assert _determine_overall_verdict(results) == SimulationVerdict.FAIL
+        assert baseline.state == BaselineState.WARM
+        assert baseline.metrics.median_cost == pytest.approx(3.0)
+        assert baseline.metrics.p90_cost == pytest.approx(4.0)
+        assert baseline.metrics.median_tokens == 300
+        assert baseline.metrics.sample_count == 4
+        assert baseline.window_start == now - timedelta(hours=5)
+        assert baseline.window_end == now - timedelta(hours=1)
+
+    def test_unexpected_enforcement_error_propagates(self):
+        """Test only guardrail violations are collected as verdicts."""
+        # Events are frozen, so one instance can stand in for all three
+        events = [self.create_test_event()] * 3
+        mock_repo = self.create_mock_repository(events=events)
         
-        # Test multiple features - most severe wins
-        results.append(
-            FeatureSimulationResult(
-                feature="test2",
-                model="model2",
-                estimated_monthly_cost=20.0,
-                violations=[(EnforcementAction.WARN, "Warning")],
-                anomalies=[]
-            )
-        )
-        assert _determine_overall_verdict(results) == SimulationVerdict.FAIL
+        with patch(
+            'ai_cost_guard.core.simulation.enforce_guardrails',
+            side_effect=TypeError("boom")
+        ):
+            with pytest.raises(TypeError, match="boom"):
+                simulate_cost_impact(
+                    feature=None,
+                    config=GuardrailConfig(),
+                    repository=mock_repo
+                )